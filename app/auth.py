@@ -2,8 +2,17 @@ import firebase_admin
 from firebase_admin import credentials, auth
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import hashlib
 import json
+import os
+import re
+import threading
+import time
+import asyncio
+import requests
+from google.auth import jwt as google_jwt
 from .config import settings
 import jwt
 
@@ -49,15 +58,137 @@ def initialize_firebase():
 # Security scheme for JWT tokens
 security = HTTPBearer()
 
+# Public keys Google signs Firebase ID tokens with
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+
+class CertificateCache:
+    """Firebase signing certificates, refreshed when their Cache-Control max-age runs out"""
+
+    # Minimum gap between refetches triggered by an unknown key id
+    MIN_REFRESH_SECONDS = 60
+
+    def __init__(self, url: str = ID_TOKEN_CERT_URL):
+        self.url = url
+        self.certs: Dict[str, str] = {}
+        self.fetched_at = 0.0
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        response = requests.get(self.url, timeout=10)
+        response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        self.certs = response.json()
+        self.fetched_at = time.time()
+        self.expires_at = self.fetched_at + (int(match.group(1)) if match else 3600)
+
+    def _stale(self, key_id: Optional[str]) -> bool:
+        now = time.time()
+        if now >= self.expires_at:
+            return True
+        # Keys rotate ahead of max-age; allow an early refetch, but not on every forged kid
+        return bool(key_id) and key_id not in self.certs and now - self.fetched_at >= self.MIN_REFRESH_SECONDS
+
+    def get(self, key_id: Optional[str] = None) -> Dict[str, str]:
+        """Current certificates, fetching them if stale or missing key_id"""
+        if self._stale(key_id):
+            with self._lock:
+                if self._stale(key_id):
+                    self.refresh()
+        return self.certs
+
+
+class TokenCache:
+    """Bounded LRU of verified claims keyed by token hash, expiring at the token's exp"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries if max_entries is not None else settings.auth_token_cache_max_entries
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(claims)
+
+    def put(self, token: str, claims: dict):
+        if self.max_entries <= 0 or "exp" not in claims:
+            return
+        with self._lock:
+            self._entries[self.key(token)] = (float(claims["exp"]), dict(claims))
+            self._entries.move_to_end(self.key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+certificate_cache = CertificateCache()
+token_cache = TokenCache()
+
+
+def prefetch_certificates():
+    """Warm the certificate cache so the first request verifies without a fetch"""
+    try:
+        certificate_cache.get()
+    except Exception as e:
+        print(f"Could not prefetch Firebase certificates: {e}")
+
+
+def verify_firebase_token(token: str) -> dict:
+    """Verify a Firebase ID token against the cached certificates
+    
+    Repeat tokens are answered from token_cache until they expire.
+    """
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+    
+    if os.getenv("FIREBASE_AUTH_EMULATOR_HOST"):
+        # Emulator tokens are unsigned; let the SDK handle them
+        claims = auth.verify_id_token(token)
+    else:
+        header = google_jwt.decode_header(token)
+        claims = google_jwt.decode(
+            token,
+            certs=certificate_cache.get(header.get("kid")),
+            audience=settings.firebase_project_id
+        )
+        if claims.get("iss") != f"https://securetoken.google.com/{settings.firebase_project_id}":
+            raise ValueError("Token has an incorrect issuer")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError("Token has an invalid subject")
+        claims["uid"] = subject
+    token_cache.put(token, claims)
+    return claims
+
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
-    print("[DEBUG] Token received in verify_token:", credentials.credentials)
+    token = credentials.credentials
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
     try:
-        token = credentials.credentials
-        decoded_token = auth.verify_id_token(token)
-        print("[DEBUG] Decoded token:", decoded_token)
-        return decoded_token
+        # A miss may need to refresh certificates over the network
+        return await asyncio.to_thread(verify_firebase_token, token)
     except Exception as e:
-        print("[DEBUG] Token verification failed:", e)
+        print(f"Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid authentication token")
 
 async def get_current_user(token_data: dict = Depends(verify_token)) -> dict:
@@ -82,7 +213,7 @@ def verify_id_token(token: str) -> dict:
     try:
         # First try to verify as ID token
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = verify_firebase_token(token)
             return decoded_token
         except:
             # If ID token verification fails, try as custom token
@@ -112,6 +243,3 @@ def verify_id_token(token: str) -> dict:
                 
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
-
-# Initialize Firebase on module import
-initialize_firebase() 
\ No newline at end of file
@@ -17,6 +17,14 @@ class Settings(BaseSettings):
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
     huggingface_api_key: str = os.getenv("HUGGINGFACE_API_KEY", "")
     
+    # Gemini Configuration
+    gemini_model: str = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+    gemini_api_base_url: str = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com")
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    generation_cache_ttl_seconds: float = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", "3600"))
+    generation_cache_max_entries: int = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1024"))
+    
     # Firebase Configuration
     firebase_project_id: str = os.getenv("FIREBASE_PROJECT_ID", "")
     firebase_private_key_id: str = os.getenv("FIREBASE_PRIVATE_KEY_ID", "")
@@ -28,6 +36,9 @@ class Settings(BaseSettings):
     firebase_auth_provider_x509_cert_url: str = os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL", "https://www.googleapis.com/oauth2/v1/certs")
     firebase_client_x509_cert_url: str = os.getenv("FIREBASE_CLIENT_X509_CERT_URL", "")
     firebase_web_api_key: str = Field(..., description="FIREBASE_WEB_API_KEY")
+    auth_token_cache_max_entries: int = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    firestore_backend: str = os.getenv("FIRESTORE_BACKEND", "firestore")  # "firestore" or "memory"
+    firestore_max_workers: int = int(os.getenv("FIRESTORE_MAX_WORKERS", "8"))
     # Grok API
     grok_api_key: str = os.getenv("GROK_API_KEY", "")
     grok_api_url: str = os.getenv("GROK_API_URL", "https://api.grok.x.ai/v1/chat/completions")
@@ -39,6 +50,18 @@ class Settings(BaseSettings):
     # File Upload Configuration
     upload_dir: str = os.getenv("UPLOAD_DIR", "./uploads")
     max_file_size: int = int(os.getenv("MAX_FILE_SIZE", "10485760")) 
+    upload_chunk_size: int = int(os.getenv("UPLOAD_CHUNK_SIZE", "65536"))
+    max_bulk_files: int = int(os.getenv("MAX_BULK_FILES", "20"))
+    max_bulk_upload_size: int = int(os.getenv("MAX_BULK_UPLOAD_SIZE", "52428800"))
+    
+    # Text extraction (PDF, DOCX, RTF) runs in a process pool
+    extraction_workers: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    extraction_timeout_seconds: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+    extraction_pages_per_task: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "8"))
+    
+    # Background ingestion of uploads
+    ingestion_workers: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    ingestion_job_retention_seconds: float = float(os.getenv("INGESTION_JOB_RETENTION_SECONDS", "86400"))
     
     class Config:
         env_file = ".env"
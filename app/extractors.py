@@ -0,0 +1,115 @@
+"""
+Document Text Extractors
+
+Format-specific text extraction for uploaded files. Each extractor splits a
+file into pages (or page-like sections) that can be read independently, so
+large documents are extracted in batches and streamed to the chunker.
+
+Extractors run inside worker processes: this module only imports the standard
+library at the top so workers start quickly, and the parsing libraries are
+imported when first needed. Register new formats with ``register_extractor``.
+"""
+
+import abc
+import os
+from typing import Dict, List, Optional
+
+
+class ExtractionError(Exception):
+    """Raised when text cannot be extracted from a file"""
+
+
+class Extractor(abc.ABC):
+    """Extracts text from one file format, a range of pages at a time"""
+
+    extensions: tuple = ()
+
+    def count_pages(self, path: str) -> int:
+        return 1
+
+    @abc.abstractmethod
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        """Text of pages [start, end)"""
+
+
+class PDFExtractor(Extractor):
+    extensions = (".pdf",)
+
+    def _reader(self, path: str):
+        try:
+            from pypdf import PdfReader
+        except ImportError as e:
+            raise ExtractionError("pypdf is required to read PDF files") from e
+        return PdfReader(path)
+
+    def count_pages(self, path: str) -> int:
+        return len(self._reader(path).pages)
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        reader = self._reader(path)
+        return [reader.pages[number].extract_text() or "" for number in range(start, end)]
+
+
+class DOCXExtractor(Extractor):
+    """Word documents have no fixed pages; every PARAGRAPHS_PER_PAGE paragraphs count as one"""
+
+    extensions = (".docx",)
+    PARAGRAPHS_PER_PAGE = 50
+
+    def _paragraphs(self, path: str) -> List[str]:
+        try:
+            import docx
+        except ImportError as e:
+            raise ExtractionError("python-docx is required to read DOCX files") from e
+        document = docx.Document(path)
+        paragraphs = [paragraph.text for paragraph in document.paragraphs]
+        for table in document.tables:
+            for row in table.rows:
+                paragraphs.append(" | ".join(cell.text for cell in row.cells))
+        return [paragraph for paragraph in paragraphs if paragraph.strip()]
+
+    def count_pages(self, path: str) -> int:
+        return max(1, -(-len(self._paragraphs(path)) // self.PARAGRAPHS_PER_PAGE))
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        paragraphs = self._paragraphs(path)
+        size = self.PARAGRAPHS_PER_PAGE
+        return ["\n".join(paragraphs[page * size:(page + 1) * size]) for page in range(start, end)]
+
+
+class RTFExtractor(Extractor):
+    extensions = (".rtf",)
+
+    def extract_pages(self, path: str, start: int, end: int) -> List[str]:
+        try:
+            from striprtf.striprtf import rtf_to_text
+        except ImportError as e:
+            raise ExtractionError("striprtf is required to read RTF files") from e
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return [rtf_to_text(f.read(), errors='ignore')]
+
+
+EXTRACTORS: Dict[str, Extractor] = {}
+
+
+def register_extractor(extractor: Extractor):
+    """Use extractor for each of its file extensions"""
+    for extension in extractor.extensions:
+        EXTRACTORS[extension.lower()] = extractor
+
+
+def get_extractor(filename: str) -> Optional[Extractor]:
+    return EXTRACTORS.get(os.path.splitext(filename or "")[1].lower())
+
+
+# Worker-process entry points (module-level so they can be pickled)
+def count_pages(extractor: Extractor, path: str) -> int:
+    return extractor.count_pages(path)
+
+
+def extract_pages(extractor: Extractor, path: str, start: int, end: int) -> List[str]:
+    return extractor.extract_pages(path, start, end)
+
+
+for _extractor in (PDFExtractor(), DOCXExtractor(), RTFExtractor()):
+    register_extractor(_extractor)
@@ -1,23 +1,76 @@
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from typing import List, Optional
+import asyncio
+import json
+from datetime import datetime
+from contextlib import asynccontextmanager
 import uvicorn
 from pydantic import BaseModel
 
-from .auth import get_current_user, verify_id_token
+from .middleware import UploadSizeLimitMiddleware
+from .auth import get_current_user, verify_id_token, initialize_firebase, prefetch_certificates
 from .models import (
     UserProfile, UserDocument, ContentGenerationRequest, 
-    ContentGenerationResponse, FileUploadResponse, AuthResponse,
+    ContentGenerationResponse, FileUploadResponse, BulkUploadResponse, IngestionStatus,
+    LinkSubmission, AuthResponse,
     DocumentType, ContentType
 )
 from .services import user_service, content_service
+from .services.llm_client import llm_client
+from .services.firestore_store import document_store
+from .services.extraction_service import extraction_service
+from .services.ingestion_queue import ingestion_worker
+from .rag import vectorstore, embedding_service, embedding_executor
 from .config import settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the process-wide vector store for the lifetime of the app"""
+    # Both services must read and write the same in-memory index
+    user_service.vector_store = vectorstore
+    content_service.vector_store = vectorstore
+    
+    # Heavy initialization happens here rather than when the app is imported
+    await asyncio.gather(
+        asyncio.to_thread(initialize_firebase),
+        asyncio.to_thread(vectorstore.ensure_loaded)
+    )
+    # The model loads in the background; /ready reports when it is warm
+    warm_up_task = asyncio.create_task(asyncio.to_thread(embedding_service.warm_up))
+    # Signing certificates are fetched once up front, not on the first request
+    certificate_task = asyncio.create_task(asyncio.to_thread(prefetch_certificates))
+    maintenance_tasks = []
+    # Read-only workers (FAISS_SHARED_INDEX) leave ingestion and index maintenance to the writer
+    if not vectorstore.read_only:
+        # Uploads are ingested by background workers fed from the persistent queue
+        ingestion_worker.start(user_service.ingest_documents)
+        maintenance_tasks = [
+            asyncio.create_task(vectorstore.run_compaction()),
+            asyncio.create_task(vectorstore.run_checkpoints()),
+            asyncio.create_task(vectorstore.run_publishing())
+        ]
+    try:
+        yield
+    finally:
+        await ingestion_worker.stop()
+        warm_up_task.cancel()
+        certificate_task.cancel()
+        for task in maintenance_tasks:
+            task.cancel()
+        await asyncio.to_thread(vectorstore.save_vectorstore)
+        embedding_executor.shutdown()
+        await llm_client.aclose()
+        document_store.close()
+        extraction_service.shutdown()
+
 app = FastAPI(
     title="PersonaApply API",
     description="AI-Based Outreach Personalization API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -29,6 +82,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before the multipart body is received in full
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=settings.max_file_size,
+    paths=["/user/documents/upload"]
+)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=settings.max_bulk_upload_size,
+    paths=["/user/documents/bulk-upload"]
+)
+
 # Security
 security = HTTPBearer()
 # class User(BaseModel):
@@ -105,30 +170,93 @@ async def update_user_profile(
     user = await user_service.update_user_profile(current_user["uid"], profile_data)
     return user
 
-@app.post("/user/documents/upload", response_model=FileUploadResponse)
+@app.post("/user/documents/upload", response_model=FileUploadResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     document_type: DocumentType = Form(...),
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload user document"""
+    """Upload user document; it is processed in the background"""
     try:
-        document = await user_service.upload_document(
+        job = await user_service.upload_document(
             current_user["uid"], 
             file, 
             document_type
         )
         
         return FileUploadResponse(
-            document_id=document.document_id,
-            filename=document.filename,
-            document_type=document.document_type,
-            status="success",
-            message="Document uploaded successfully"
+            document_id=job.document_id,
+            filename=job.filename,
+            document_type=job.document_type,
+            status=job.status,
+            message="Document uploaded and queued for processing",
+            status_url=f"/user/documents/{job.document_id}/status"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/user/documents/bulk-upload", response_model=BulkUploadResponse, status_code=202)
+async def bulk_upload_documents(
+    files: List[UploadFile] = File([]),
+    document_types: List[DocumentType] = Form([]),
+    links: Optional[str] = Form(None, description="JSON list of {url, document_type, description}"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload several documents and links at once; they are ingested together in the background"""
+    try:
+        link_submissions = [LinkSubmission(**link) for link in json.loads(links)] if links else []
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid links: {str(e)}")
+    if not files and not link_submissions:
+        raise HTTPException(status_code=400, detail="No files or links provided")
+    
+    items = await user_service.upload_documents(
+        current_user["uid"],
+        files,
+        document_types,
+        link_submissions
+    )
+    results = []
+    for filename, document_type, outcome in items:
+        if isinstance(outcome, HTTPException):
+            results.append(FileUploadResponse(
+                filename=filename,
+                document_type=document_type,
+                status="rejected",
+                message=outcome.detail
+            ))
+        else:
+            results.append(FileUploadResponse(
+                document_id=outcome.document_id,
+                filename=filename,
+                document_type=document_type,
+                status=outcome.status,
+                message="Document uploaded and queued for processing",
+                status_url=f"/user/documents/{outcome.document_id}/status"
+            ))
+    return BulkUploadResponse(results=results)
+
+@app.get("/user/documents/{document_id}/status", response_model=IngestionStatus)
+async def get_document_status(
+    document_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the ingestion progress of an uploaded document"""
+    job = await user_service.get_document_status(current_user["uid"], document_id)
+    return IngestionStatus(
+        document_id=job.document_id,
+        filename=job.filename,
+        document_type=job.document_type,
+        status=job.status,
+        pages_processed=job.pages_processed,
+        chunks_processed=job.chunks_processed,
+        error=job.error,
+        created_at=datetime.utcfromtimestamp(job.created_at),
+        updated_at=datetime.utcfromtimestamp(job.updated_at)
+    )
+
 @app.get("/user/documents", response_model=List[UserDocument])
 async def get_user_documents(current_user: dict = Depends(get_current_user)):
     """Get all user documents"""
@@ -159,6 +287,36 @@ async def generate_content(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(event: str, data: str) -> str:
+    """Format one server-sent event; data must already be JSON"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.post("/content/generate/stream")
+async def generate_content_stream(
+    request: ContentGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream personalized content as server-sent events
+    
+    Emits ``token`` events with text deltas and a final ``complete`` event
+    carrying the full ContentGenerationResponse.
+    """
+    async def events():
+        try:
+            async for item in content_service.generate_content_stream(current_user["uid"], request):
+                if isinstance(item, ContentGenerationResponse):
+                    yield _sse_event("complete", item.model_dump_json())
+                else:
+                    yield _sse_event("token", json.dumps({"text": item}))
+        except Exception as e:
+            yield _sse_event("error", json.dumps({"detail": str(e)}))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/content/generate-all")
 async def generate_all_content(
     request: ContentGenerationRequest,
@@ -174,6 +332,21 @@ async def generate_all_content(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/content/generate-all/stream")
+async def generate_all_content_stream(
+    request: ContentGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate all content types, streaming each result as NDJSON as it completes"""
+    async def lines():
+        try:
+            async for result in content_service.iter_multiple_content(current_user["uid"], request):
+                yield result.model_dump_json() + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -182,6 +355,17 @@ async def health_check():
         "timestamp": "2024-01-01T00:00:00Z"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until the embedding model and index are warm"""
+    checks = {
+        "embedding_model": embedding_service.ready,
+        "vector_index": vectorstore.loaded
+    }
+    if not all(checks.values()):
+        return JSONResponse(status_code=503, content={"status": "starting", "checks": checks})
+    return {"status": "ready", "checks": checks}
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -0,0 +1,82 @@
+"""
+Request Body Size Limits
+
+Multipart uploads are parsed (and spooled to disk) before the endpoint runs,
+so an oversized file would otherwise be received in full before
+``UserService`` could reject it. This ASGI middleware rejects upload requests
+with 413 as soon as the declared ``Content-Length``, or the bytes actually
+received, exceed the limit.
+"""
+
+from typing import Iterable
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Room for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class _BodyTooLarge(HTTPException):
+    """An HTTPException so the app's handlers turn it into a 413 mid-parse"""
+
+    def __init__(self):
+        super().__init__(status_code=413, detail="File too large")
+
+
+class UploadSizeLimitMiddleware:
+    """Caps the request body size for the given path prefixes"""
+
+    def __init__(self, app: ASGIApp, max_body_size: int, paths: Iterable[str]):
+        self.app = app
+        self.max_body_size = max_body_size + MULTIPART_OVERHEAD_BYTES
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_size:
+            await self._reject(send)
+            return
+
+        # Chunked requests have no Content-Length, so count bytes as they arrive
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send)
+
+    @staticmethod
+    async def _reject(send: Send):
+        body = b'{"detail":"File too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
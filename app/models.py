@@ -54,6 +54,7 @@ class ContentGenerationRequest(BaseModel):
     target_role: Optional[str] = Field(None, description="Target role/title")
     additional_context: Optional[str] = Field(None, description="Additional context or requirements")
     tone: Optional[str] = Field("professional", description="Tone of the message")
+    regenerate: bool = Field(False, description="Bypass cached results and generate fresh content")
 
 class ContentGenerationResponse(BaseModel):
     """Response model for generated content"""
@@ -65,11 +66,34 @@ class ContentGenerationResponse(BaseModel):
 
 class FileUploadResponse(BaseModel):
     """Response model for file upload"""
-    document_id: str
+    document_id: Optional[str] = None
     filename: str
     document_type: DocumentType
     status: str
     message: str
+    status_url: Optional[str] = Field(None, description="Where to poll ingestion progress")
+
+class LinkSubmission(BaseModel):
+    """A link added to a user's documents"""
+    url: str = Field(..., description="http(s) URL")
+    document_type: DocumentType = Field(DocumentType.OTHER, description="Type of link")
+    description: Optional[str] = Field(None, description="Brief description of the link")
+
+class BulkUploadResponse(BaseModel):
+    """Response model for a multi-file upload, one result per file or link"""
+    results: List[FileUploadResponse]
+
+class IngestionStatus(BaseModel):
+    """Progress of a document through background ingestion"""
+    document_id: str
+    filename: str
+    document_type: DocumentType
+    status: str = Field(..., description="queued, processing, completed or failed")
+    pages_processed: int = 0
+    chunks_processed: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 class AuthResponse(BaseModel):
     """Authentication response model"""
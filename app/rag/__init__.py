@@ -7,6 +7,8 @@ This module handles all vector storage and retrieval operations using FAISS.
 from .vectorstore import VectorStore, vectorstore
 from .embeddings import EmbeddingService, embedding_service
 from .config import FAISSConfig, faiss_config
+from .executor import EmbeddingExecutor, embedding_executor
+from .shards import ShardManager, UserShard
 
 __all__ = [
     "VectorStore", 
@@ -14,5 +16,9 @@ __all__ = [
     "EmbeddingService",
     "embedding_service", 
     "FAISSConfig",
-    "faiss_config"
+    "faiss_config",
+    "EmbeddingExecutor",
+    "embedding_executor",
+    "ShardManager",
+    "UserShard"
 ] 
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+Memory-mapped Chunk Table
+
+Read-only view of the chunks in a shard snapshot. Every reader process maps
+the same files, so the data is shared through the page cache instead of each
+worker unpickling its own copy. A table is three files written next to the
+snapshot's index:
+
+- ``chunk_ids.npy``: sorted vector IDs (int64)
+- ``chunk_offsets.npy``: where each record starts in ``chunks.bin``, followed by the end offset
+- ``chunks.bin``: pickled ``{"metadata", "text_offset"}`` records, stored one after another
+
+The text itself lives in the shard's text file (see ``text_store``).
+
+A record is only unpickled when it is looked up.
+"""
+
+import mmap
+import os
+import pickle
+from typing import Any, Dict, Iterator, Mapping
+import numpy as np
+
+IDS_FILE = "chunk_ids.npy"
+OFFSETS_FILE = "chunk_offsets.npy"
+RECORDS_FILE = "chunks.bin"
+
+
+def write_chunk_table(directory: str, chunks: Mapping[int, Dict[str, Any]]):
+    """Write chunks (vector ID -> record) as a chunk table in directory"""
+    ids = np.fromiter(sorted(chunks), dtype=np.int64, count=len(chunks))
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    with open(os.path.join(directory, RECORDS_FILE), 'wb') as f:
+        for position, vector_id in enumerate(ids.tolist()):
+            f.write(pickle.dumps(chunks[vector_id], protocol=pickle.HIGHEST_PROTOCOL))
+            offsets[position + 1] = f.tell()
+    np.save(os.path.join(directory, IDS_FILE), ids)
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+
+
+class ChunkTable(Mapping):
+    """Vector ID -> chunk record mapping backed by memory-mapped snapshot files"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ids = np.load(os.path.join(directory, IDS_FILE), mmap_mode='r')
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode='r')
+        with open(os.path.join(directory, RECORDS_FILE), 'rb') as f:
+            # mmap refuses empty files; an empty shard has no records to map
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, IDS_FILE))
+
+    def _position(self, vector_id: int) -> int:
+        position = int(np.searchsorted(self.ids, vector_id))
+        if position < len(self.ids) and self.ids[position] == vector_id:
+            return position
+        return -1
+
+    def __getitem__(self, vector_id: int) -> Dict[str, Any]:
+        position = self._position(vector_id)
+        if position < 0:
+            raise KeyError(vector_id)
+        return pickle.loads(self._records[self.offsets[position]:self.offsets[position + 1]])
+
+    def __contains__(self, vector_id) -> bool:
+        return self._position(vector_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped record file (shared page cache, not process heap)"""
+        return len(self._records)
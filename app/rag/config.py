@@ -5,7 +5,7 @@ This module contains all configuration settings related to FAISS vector storage.
 """
 
 import os
-from typing import Optional
+from typing import Dict, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -24,6 +24,36 @@ class FAISSConfig(BaseModel):
         description="HuggingFace embedding model name"
     )
     
+    embedding_batch_size: int = Field(
+        default=64,
+        description="Maximum number of texts combined into one embedding batch"
+    )
+    
+    embedding_batch_wait_ms: float = Field(
+        default=10.0,
+        description="How long a partial embedding batch waits for more requests"
+    )
+    
+    embedding_workers: int = Field(
+        default=1,
+        description="Number of worker threads embedding document chunks"
+    )
+    
+    embedding_query_workers: int = Field(
+        default=1,
+        description="Number of worker threads embedding retrieval queries, kept apart from uploads"
+    )
+    
+    embedding_cache_enabled: bool = Field(
+        default=True,
+        description="Reuse embeddings of previously seen chunks from an on-disk cache"
+    )
+    
+    embedding_cache_directory: str = Field(
+        default="embedding_cache",
+        description="Directory (under persist_directory) holding cached chunk embeddings"
+    )
+    
     # Text splitting settings
     chunk_size: int = Field(
         default=1000,
@@ -46,6 +76,58 @@ class FAISSConfig(BaseModel):
         description="Maximum number of chunks to include in context"
     )
     
+    query_context_chunks: int = Field(
+        default=4,
+        description="Number of chunks to include when retrieval is ranked by a job description"
+    )
+    
+    max_query_chars: int = Field(
+        default=2000,
+        description="Maximum characters of the request text embedded as a retrieval query"
+    )
+    
+    # Context packing settings
+    context_candidates: int = Field(
+        default=3,
+        description="Candidates retrieved per context chunk for maximal marginal relevance to choose from"
+    )
+    
+    context_mmr_lambda: float = Field(
+        default=0.7,
+        description="MMR trade-off between relevance (1.0) and diversity (0.0) of context chunks"
+    )
+    
+    context_token_budgets: Dict[str, int] = Field(
+        default={"cover_letter": 1200, "cold_email": 700, "linkedin_message": 300},
+        description="Approximate prompt tokens of user context per content type"
+    )
+    
+    # Hybrid retrieval settings
+    search_mode: str = Field(
+        default=os.getenv("FAISS_SEARCH_MODE", "hybrid"),
+        description="Context retrieval: dense (embeddings only) or hybrid (embeddings fused with BM25)"
+    )
+    
+    hybrid_alpha: float = Field(
+        default=0.5,
+        description="Weight of the dense score in hybrid search; the BM25 score gets the rest"
+    )
+    
+    hybrid_candidates: int = Field(
+        default=4,
+        description="Candidates taken from each retriever per requested chunk before fusion"
+    )
+    
+    bm25_k1: float = Field(
+        default=1.2,
+        description="BM25 term frequency saturation"
+    )
+    
+    bm25_b: float = Field(
+        default=0.75,
+        description="BM25 chunk length normalization"
+    )
+    
     # Index settings
     index_name: str = Field(
         default="faiss_index",
@@ -54,7 +136,118 @@ class FAISSConfig(BaseModel):
     
     documents_file: str = Field(
         default="documents.pkl",
-        description="Name of the documents metadata file"
+        description="Name of the pickled documents metadata file (migrated into metadata_db_file)"
+    )
+    
+    metadata_db_file: str = Field(
+        default="metadata.db",
+        description="SQLite database (under persist_directory) holding document and chunk metadata"
+    )
+    
+    # ANN index settings
+    index_type: Literal["flat", "hnsw", "ivfpq", "sq8"] = Field(
+        default=os.getenv("FAISS_INDEX_TYPE", "flat"),
+        # Defaults aren't validated otherwise, and a typo in the env var would only surface at shard creation
+        validate_default=True,
+        description="Shard index type: flat (exact), hnsw, ivfpq or sq8"
+    )
+    
+    index_train_min_vectors: int = Field(
+        default=10000,
+        description="Vectors a shard needs before a trained index type (ivfpq, sq8) replaces its flat index"
+    )
+    
+    hnsw_m: int = Field(
+        default=32,
+        description="Neighbors per HNSW node; higher improves recall at the cost of memory"
+    )
+    
+    hnsw_ef_construction: int = Field(
+        default=40,
+        description="Candidate list size while building the HNSW graph"
+    )
+    
+    hnsw_ef_search: int = Field(
+        default=64,
+        description="Candidate list size per HNSW query; higher improves recall, lowers speed"
+    )
+    
+    ivf_nlist: int = Field(
+        default=0,
+        description="Number of IVF lists (0 picks about 4 * sqrt(vectors) at training time)"
+    )
+    
+    ivf_nprobe: int = Field(
+        default=16,
+        description="IVF lists scanned per query"
+    )
+    
+    pq_m: int = Field(
+        default=48,
+        description="Sub-quantizers per IVF-PQ code; reduced to a divisor of the embedding dimension"
+    )
+    
+    pq_nbits: int = Field(
+        default=8,
+        description="Bits per IVF-PQ sub-quantizer code"
+    )
+    
+    # Chunk text settings
+    text_compression: str = Field(
+        default=os.getenv("FAISS_TEXT_COMPRESSION", "none"),
+        description="Compression of stored chunk text: none or zstd (needs the zstandard package)"
+    )
+    
+    text_compression_level: int = Field(
+        default=3,
+        description="zstd compression level for chunk text"
+    )
+    
+    text_garbage_ratio: float = Field(
+        default=0.5,
+        description="Share of a shard's text file taken by deleted chunks before compaction rewrites it"
+    )
+    
+    # Shard settings
+    shards_directory: str = Field(
+        default="shards",
+        description="Directory (under persist_directory) holding per-user FAISS shards"
+    )
+    
+    shard_memory_budget_mb: int = Field(
+        default=int(os.getenv("FAISS_SHARD_MEMORY_BUDGET_MB", "512")),
+        description="Approximate memory budget for loaded user shards before LRU eviction"
+    )
+    
+    compaction_interval_seconds: int = Field(
+        default=300,
+        description="How often deleted vectors are physically removed from loaded shards"
+    )
+    
+    shared_index: bool = Field(
+        default=os.getenv("FAISS_SHARED_INDEX", "false").lower() in ("1", "true", "yes"),
+        description="Worker processes share the data directory: one writes, the others map published snapshots"
+    )
+    
+    publish_interval_seconds: float = Field(
+        default=2.0,
+        description="With shared_index on, how often the writer publishes snapshots of shards written since the last pass"
+    )
+    
+    writer_lock_file: str = Field(
+        default="writer.lock",
+        description="Lock file (under persist_directory) held by the writer process when shared_index is on"
+    )
+    
+    # Write-ahead log settings
+    wal_commit_window_ms: float = Field(
+        default=5.0,
+        description="How long the group committer waits to batch concurrent WAL appends"
+    )
+    
+    checkpoint_interval_seconds: int = Field(
+        default=60,
+        description="How often shards with un-checkpointed WAL records are snapshotted"
     )
 
 
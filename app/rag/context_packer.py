@@ -0,0 +1,138 @@
+"""
+Context Packing
+
+Turns a user's ranked search results into the context section of a prompt:
+
+1. Maximal marginal relevance (MMR) picks chunks that are relevant to the
+   request without being near-duplicates of chunks already picked.
+2. Picked chunks that follow each other in the same document are merged, so
+   the text the splitter repeats in their overlap appears only once.
+3. The merged segments are added in order of relevance until the token budget
+   of the content type is spent.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain.docstore.document import Document
+
+# Same rough estimate as the tokens_used reported for generated content
+CHARS_PER_TOKEN = 4
+# Shorter common prefixes/suffixes are treated as coincidence, not splitter overlap
+MIN_OVERLAP_CHARS = 10
+
+NO_DOCUMENTS = "No user documents found."
+RETRIEVAL_ERROR = "Error retrieving user context."
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def mmr(scores: List[float], vectors: np.ndarray, k: int, relevance_weight: float) -> List[int]:
+    """Positions of up to k candidates in MMR selection order
+
+    scores rank the candidates (higher is better); vectors holds their
+    embeddings, one row each. relevance_weight trades relevance (1.0) against
+    diversity (0.0).
+    """
+    if not scores:
+        return []
+    relevance = np.asarray(scores, dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms > 0, norms, 1)
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    remaining = set(range(len(scores))) - set(selected)
+    while remaining and len(selected) < k:
+        best = max(remaining, key=lambda i: relevance_weight * relevance[i] - (1 - relevance_weight) * redundancy[i])
+        selected.append(best)
+        remaining.remove(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
+
+
+def merge_overlap(first: str, second: str, max_overlap: int) -> str:
+    """Join consecutive chunks, dropping the text the splitter repeated at the seam"""
+    for size in range(min(len(first), len(second), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+
+def _join(run: List[Tuple[int, int, Document]], max_overlap: int) -> Tuple[int, Document]:
+    text = run[0][2].page_content
+    for _, _, doc in run[1:]:
+        text = merge_overlap(text, doc.page_content, max_overlap)
+    best_position = min(position for _, position, _ in run)
+    return best_position, Document(page_content=text, metadata=run[0][2].metadata)
+
+
+def merge_adjacent(documents: List[Document], max_overlap: int) -> List[Document]:
+    """Merge chunks with consecutive chunk_ids of the same document
+
+    documents are in relevance order; a merged segment takes the place of its
+    most relevant chunk.
+    """
+    segments: List[Tuple[int, Document]] = []
+    by_document: Dict[str, List[Tuple[int, int, Document]]] = {}
+    for position, doc in enumerate(documents):
+        document_id, chunk_id = doc.metadata.get("document_id"), doc.metadata.get("chunk_id")
+        if document_id is None or chunk_id is None:
+            segments.append((position, doc))
+        else:
+            by_document.setdefault(document_id, []).append((chunk_id, position, doc))
+
+    for chunks in by_document.values():
+        chunks.sort(key=lambda item: item[0])
+        run = [chunks[0]]
+        for item in chunks[1:]:
+            if item[0] == run[-1][0] + 1:
+                run.append(item)
+            else:
+                segments.append(_join(run, max_overlap))
+                run = [item]
+        segments.append(_join(run, max_overlap))
+
+    segments.sort(key=lambda item: item[0])
+    return [doc for _, doc in segments]
+
+
+def _format_segment(doc: Document, content: str = None) -> str:
+    doc_type = doc.metadata.get("document_type", "unknown")
+    return f"Document Type: {doc_type}\nContent: {doc.page_content if content is None else content}\n---"
+
+
+def pack_context(segments: Optional[List[Document]], token_budget: Optional[int] = None) -> str:
+    """Format segments (most relevant first) as prompt context within token_budget
+
+    Segments that do not fit are skipped in favour of smaller, less relevant
+    ones; the most relevant segment is truncated rather than dropped if it
+    alone exceeds the budget. segments is None when retrieval failed.
+    """
+    if segments is None:
+        return RETRIEVAL_ERROR
+    if not segments:
+        return NO_DOCUMENTS
+
+    parts = []
+    remaining = token_budget
+    for doc in segments:
+        part = _format_segment(doc)
+        # Parts after the first also pay for the newline that joins them
+        cost = estimate_tokens("\n" + part if parts else part)
+        if remaining is None or cost <= remaining:
+            parts.append(part)
+            if remaining is not None:
+                remaining -= cost
+        elif not parts:
+            overhead = len(_format_segment(doc, ""))
+            content = doc.page_content[:max(0, remaining * CHARS_PER_TOKEN - overhead)]
+            # Cut at a word boundary
+            content = content.rsplit(" ", 1)[0] if " " in content else content
+            parts.append(_format_segment(doc, content))
+            break
+    return "\n".join(parts)
@@ -0,0 +1,167 @@
+"""
+Embedding Cache
+
+This module keeps a persistent, content-addressed cache of chunk embeddings so
+re-uploaded or lightly revised documents only send new chunks to the model.
+Entries are keyed by ``sha256(model name, chunk text)``. Vectors are appended
+to a flat float32 file that is read through a memory map, and the matching
+digests are appended to a parallel keys file.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class EmbeddingCache:
+    """Append-only on-disk cache of embeddings for one model"""
+
+    KEY_SIZE = 32  # sha256 digest
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        # One subdirectory per model so vectors of different sizes never mix
+        model_dir = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(directory, model_dir)
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._row_count = 0  # rows in both files, duplicate keys included
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self._read_meta():
+            return
+        with self._file_lock():
+            self._catch_up()
+            # A crash between the two appends can leave one file ahead of the other
+            self._truncate(self._row_count)
+
+    def _read_meta(self) -> bool:
+        """Pick up the vector size once the cache has been created (possibly by another process)"""
+        if self.dim is not None:
+            return True
+        if not os.path.exists(self.meta_path):
+            return False
+        with open(self.meta_path) as f:
+            self.dim = json.load(f)["dim"]
+        for path in (self.keys_path, self.vectors_path):
+            if not os.path.exists(path):
+                open(path, 'ab').close()
+        return True
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Serialize appends across worker processes sharing the cache directory
+        
+        Readers take the lock shared so they never index a half-written append.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "lock"), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        """Index rows appended since we last looked (possibly by another process)"""
+        known = self._row_count
+        rows = min(
+            os.path.getsize(self.keys_path) // self.KEY_SIZE,
+            os.path.getsize(self.vectors_path) // (self.dim * 4)
+        )
+        if rows <= known:
+            return
+        with open(self.keys_path, 'rb') as f:
+            f.seek(known * self.KEY_SIZE)
+            keys = f.read((rows - known) * self.KEY_SIZE)
+        for offset in range(rows - known):
+            self._rows.setdefault(keys[offset * self.KEY_SIZE:(offset + 1) * self.KEY_SIZE], known + offset)
+        self._row_count = rows
+
+    def _truncate(self, rows: int):
+        """Drop any partially written tail so both files hold exactly `rows` entries"""
+        for path, row_size in ((self.keys_path, self.KEY_SIZE), (self.vectors_path, self.dim * 4)):
+            if os.path.getsize(path) != rows * row_size:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * row_size)
+
+    def key(self, text: str) -> bytes:
+        """Content address of a chunk for this model"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _vectors(self) -> np.memmap:
+        """Memory map covering every row written so far"""
+        if self._mmap is None or len(self._mmap) < self._row_count:
+            self._mmap = np.memmap(
+                self.vectors_path, dtype=np.float32, mode='r', shape=(self._row_count, self.dim)
+            )
+        return self._mmap
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for texts, with None for misses"""
+        with self._lock:
+            if not self._read_meta():
+                return [None] * len(texts)
+            # Rows other workers appended since our last look become hits too
+            with self._file_lock(shared=True):
+                self._catch_up()
+            if not self._rows:
+                return [None] * len(texts)
+            vectors = self._vectors()
+            results = []
+            for text in texts:
+                row = self._rows.get(self.key(text))
+                results.append(vectors[row].tolist() if row is not None else None)
+            return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append new entries; texts already cached are skipped"""
+        if not texts:
+            return
+        with self._lock:
+            with self._file_lock():
+                if self.dim is None:
+                    self.dim = len(vectors[0])
+                    with open(self.meta_path, 'w') as f:
+                        json.dump({"model": self.model_name, "dim": self.dim}, f)
+                    for path in (self.keys_path, self.vectors_path):
+                        open(path, 'ab').close()
+                self._catch_up()
+                # An append that failed halfway (here or in another process) must not shift later rows
+                self._truncate(self._row_count)
+
+                new_keys, new_vectors = [], []
+                pending = set()
+                for text, vector in zip(texts, vectors):
+                    key = self.key(text)
+                    if key in self._rows or key in pending:
+                        continue
+                    pending.add(key)
+                    new_keys.append(key)
+                    new_vectors.append(vector)
+                if not new_keys:
+                    return
+
+                # Vectors first: a key without its vector is truncated away before the next append
+                with open(self.vectors_path, 'ab') as f:
+                    f.write(np.asarray(new_vectors, dtype=np.float32).tobytes())
+                with open(self.keys_path, 'ab') as f:
+                    f.write(b"".join(new_keys))
+                for row, key in enumerate(new_keys, start=self._row_count):
+                    self._rows[key] = row
+                self._row_count += len(new_keys)
+
+    def __len__(self) -> int:
+        return len(self._rows)
@@ -2,28 +2,72 @@
 Text Embeddings Module
 
 This module handles text embedding operations using HuggingFace models.
+The model is loaded on first use (or by ``warm_up`` at startup), so importing
+this module stays cheap.
 """
 
-from typing import List, Optional
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+import threading
+from typing import TYPE_CHECKING, List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from .config import faiss_config
+from .embedding_cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    from langchain_community.embeddings import HuggingFaceEmbeddings
 
 
 class EmbeddingService:
     """Service for handling text embeddings and chunking"""
     
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=faiss_config.embedding_model
-        )
+        self._embeddings: Optional["HuggingFaceEmbeddings"] = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._load_lock = threading.Lock()
+        self.ready = False  # model loaded and warmed up
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=faiss_config.chunk_size,
             chunk_overlap=faiss_config.chunk_overlap,
             length_function=len,
         )
     
-    def get_embeddings(self) -> HuggingFaceEmbeddings:
+    @property
+    def embeddings(self) -> "HuggingFaceEmbeddings":
+        """The embedding model, loaded on first access"""
+        if self._embeddings is None:
+            with self._load_lock:
+                if self._embeddings is None:
+                    # Importing the HuggingFace stack alone takes most of a second
+                    from langchain_community.embeddings import HuggingFaceEmbeddings
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=faiss_config.embedding_model
+                    )
+        return self._embeddings
+    
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        """Persistent chunk embedding cache, opened on first access"""
+        if not faiss_config.embedding_cache_enabled:
+            return None
+        if self._cache is None:
+            with self._load_lock:
+                if self._cache is None:
+                    self._cache = EmbeddingCache(
+                        os.path.join(faiss_config.persist_directory, faiss_config.embedding_cache_directory),
+                        faiss_config.embedding_model
+                    )
+        return self._cache
+    
+    def warm_up(self):
+        """Load the model and run one inference so the first request isn't slow"""
+        try:
+            self.embeddings.embed_query("warm up")
+            self.ready = True
+            print("Embedding model warmed up")
+        except Exception as e:
+            print(f"Error warming up embedding model: {e}")
+    
+    def get_embeddings(self) -> "HuggingFaceEmbeddings":
         """Get the embedding model instance"""
         return self.embeddings
     
@@ -39,9 +83,25 @@ class EmbeddingService:
         """Embed a single text string"""
         return self.embeddings.embed_query(text)
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Embed multiple text strings"""
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed retrieval queries (bypasses the chunk cache)"""
         return self.embeddings.embed_documents(texts)
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed multiple text strings, only sending cache misses to the model"""
+        cache = self.cache
+        if cache is None or not texts:
+            return self.embeddings.embed_documents(texts)
+        
+        vectors = cache.get_many(texts)
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            miss_vectors = self.embeddings.embed_documents(miss_texts)
+            cache.put_many(miss_texts, miss_vectors)
+            for i, vector in zip(misses, miss_vectors):
+                vectors[i] = vector
+        return vectors
 
 
 # Global embedding service instance
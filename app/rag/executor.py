@@ -0,0 +1,169 @@
+"""
+Embedding Executor
+
+This module runs sentence-transformer inference off the event loop. Concurrent
+embed requests (chunks from different uploads, retrieval queries) are queued,
+combined into micro-batches that flush when full or after a short wait, and
+executed in a worker pool in slices of at most ``embedding_batch_size`` texts.
+Queries run on their own worker, so a large upload cannot hold up retrieval.
+Callers simply await the vectors for their texts.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from .config import faiss_config
+from .embeddings import EmbeddingService, embedding_service
+
+
+class _Request:
+    """One caller's texts; its vectors may come back from several slices"""
+
+    def __init__(self, texts: List[str], future: asyncio.Future):
+        self.texts = texts
+        self.future = future
+        self.vectors: List[Optional[List[float]]] = [None] * len(texts)
+        self.remaining = len(texts)
+
+
+# (request, start, end): texts [start, end) of a request that go into one slice
+_Segment = Tuple[_Request, int, int]
+
+
+class _Batcher:
+    """Collects texts for one embedding function and runs them in bounded slices
+    
+    A flush packs the queued requests into slices of at most max_batch_size
+    texts. At most `concurrency` slices run at a time, so one large upload
+    occupies the worker pool a slice at a time instead of in one long call.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        executor: "EmbeddingExecutor",
+        pool: ThreadPoolExecutor,
+        concurrency: int
+    ):
+        self.embed = embed
+        self.executor = executor
+        self.pool = pool
+        self.concurrency = concurrency
+        self.pending: List[_Request] = []
+        self.pending_texts = 0
+        self.slices: Deque[List[_Segment]] = deque()
+        self.running = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def submit(self, texts: List[str]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(_Request(texts, future))
+        self.pending_texts += len(texts)
+        if self.pending_texts >= self.executor.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.executor.max_wait_seconds, self.flush)
+        return future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        requests, self.pending, self.pending_texts = self.pending, [], 0
+
+        size = self.executor.max_batch_size
+        current: List[_Segment] = []
+        filled = 0
+        for request in requests:
+            start = 0
+            while start < len(request.texts):
+                end = min(len(request.texts), start + size - filled)
+                current.append((request, start, end))
+                filled += end - start
+                start = end
+                if filled == size:
+                    self.slices.append(current)
+                    current, filled = [], 0
+        if current:
+            self.slices.append(current)
+        self._dispatch()
+
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.running < self.concurrency and self.slices:
+            # Drop parts of requests whose caller went away (e.g. request cancelled)
+            batch = [segment for segment in self.slices.popleft() if not segment[0].future.done()]
+            if not batch:
+                continue
+            texts = [text for request, start, end in batch for text in request.texts[start:end]]
+            self.running += 1
+            work = loop.run_in_executor(self.pool, self.embed, texts)
+            work.add_done_callback(lambda done, batch=batch: self._resolve(batch, done))
+
+    def _resolve(self, batch: List[_Segment], done: asyncio.Future):
+        self.running -= 1
+        error = done.exception()
+        vectors = None if error else done.result()
+        offset = 0
+        for request, start, end in batch:
+            count = end - start
+            if not request.future.done():
+                if error:
+                    request.future.set_exception(error)
+                else:
+                    request.vectors[start:end] = vectors[offset:offset + count]
+                    request.remaining -= count
+                    if request.remaining == 0:
+                        request.future.set_result(request.vectors)
+            offset += count
+        self._dispatch()
+
+
+class EmbeddingExecutor:
+    """Awaitable, micro-batched front end for EmbeddingService"""
+
+    def __init__(
+        self,
+        service: EmbeddingService,
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+        workers: int = None,
+        query_workers: int = None
+    ):
+        self.service = service
+        self.max_batch_size = max_batch_size or faiss_config.embedding_batch_size
+        self.max_wait_seconds = (max_wait_ms if max_wait_ms is not None else faiss_config.embedding_batch_wait_ms) / 1000
+        workers = workers or faiss_config.embedding_workers
+        query_workers = query_workers or faiss_config.embedding_query_workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        # Queries get their own threads so retrieval never waits behind an upload
+        self.query_pool = ThreadPoolExecutor(max_workers=query_workers, thread_name_prefix="embedding-query")
+        # Document chunks go through the embedding cache; queries do not
+        self._batchers: Dict[str, _Batcher] = {
+            "documents": _Batcher(service.embed_texts, self, self.pool, workers),
+            "queries": _Batcher(service.embed_queries, self, self.query_pool, query_workers),
+        }
+
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed document chunks"""
+        if not texts:
+            return []
+        return await self._batchers["documents"].submit(texts)
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a single retrieval query"""
+        vectors = await self._batchers["queries"].submit([text])
+        return vectors[0]
+
+    def shutdown(self):
+        """Stop the worker pools once queued batches have finished"""
+        self.query_pool.shutdown(wait=True)
+        self.pool.shutdown(wait=True)
+
+
+# Global embedding executor instance
+embedding_executor = EmbeddingExecutor(embedding_service)
@@ -0,0 +1,177 @@
+"""
+FAISS Index Types
+
+Builds the ANN index held by each user shard from ``FAISSConfig.index_type``:
+
+- ``flat``: exact brute-force search over float32 vectors (4 bytes per dimension)
+- ``hnsw``: HNSW graph over float32 vectors; fastest search, largest footprint
+- ``ivfpq``: inverted lists of product-quantized codes; a few dozen bytes per vector
+- ``sq8``: int8 scalar quantization; a quarter of the flat size, near-exact recall
+
+Every index is wrapped in ``IndexIDMap2`` so chunks keep stable vector IDs.
+Types that must be trained (``ivfpq``, ``sq8``) are only built once a shard
+holds ``index_train_min_vectors`` vectors; until then the shard stays flat,
+which is also the fastest option for small corpora.
+"""
+
+import math
+from typing import Iterable, Optional, Tuple
+import faiss
+import numpy as np
+from .config import FAISSConfig, faiss_config
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "sq8")
+TRAINED_INDEX_TYPES = ("ivfpq", "sq8")
+
+# IndexIDMap2 keeps an ID array plus a reverse hash map
+ID_MAP_BYTES_PER_VECTOR = 24
+# IVF inverted lists store an ID next to every code
+IVF_ID_BYTES = 8
+# faiss >= 1.10 maps flat codes in place; older releases only map IVF inverted lists
+MAPS_FLAT_CODES = hasattr(faiss, "IO_FLAG_MMAP_IFC")
+MMAP_FLAG = faiss.IO_FLAG_MMAP_IFC if MAPS_FLAT_CODES else faiss.IO_FLAG_MMAP
+
+
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    """Largest sub-quantizer count <= requested that divides dim"""
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _ivf_lists(ntotal: int, config: FAISSConfig) -> int:
+    """Inverted list count: configured, or ~4 * sqrt(n), with enough vectors per list to train"""
+    nlist = config.ivf_nlist or int(4 * math.sqrt(ntotal))
+    return max(1, min(nlist, ntotal // 39))
+
+
+def factory_string(index_type: str, dim: int, ntotal: int = 0, config: FAISSConfig = None) -> str:
+    """``faiss.index_factory`` description of the given index type"""
+    config = config or faiss_config
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{config.hnsw_m}"
+    if index_type == "ivfpq":
+        m = _pq_subquantizers(dim, config.pq_m)
+        return f"IDMap2,IVF{_ivf_lists(ntotal, config)},PQ{m}x{config.pq_nbits}"
+    if index_type == "sq8":
+        return "IDMap2,SQ8"
+    raise ValueError(f"Unknown FAISS index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+
+def can_build(index_type: str, ntotal: int, config: FAISSConfig = None) -> bool:
+    """Whether a shard with ntotal vectors has enough data for the index type"""
+    config = config or faiss_config
+    return index_type not in TRAINED_INDEX_TYPES or ntotal >= config.index_train_min_vectors
+
+
+def build_index(dim: int, index_type: str = None, training_vectors: Optional[np.ndarray] = None,
+                config: FAISSConfig = None) -> faiss.IndexIDMap2:
+    """Empty ID-mapped index of the given type, trained on training_vectors if it needs training"""
+    config = config or faiss_config
+    index_type = index_type or config.index_type
+    ntotal = 0 if training_vectors is None else len(training_vectors)
+    index = faiss.index_factory(dim, factory_string(index_type, dim, ntotal, config))
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.hnsw.efConstruction = config.hnsw_ef_construction
+    if not index.is_trained:
+        if training_vectors is None:
+            raise ValueError(f"A {index_type} index must be trained before use")
+        index.train(training_vectors)
+    configure_search(index, config)
+    return index
+
+
+def _hnsw(index) -> Optional[faiss.IndexHNSW]:
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    return inner if isinstance(inner, faiss.IndexHNSW) else None
+
+
+def index_type_of(index) -> str:
+    """Which of INDEX_TYPES an index built here (or loaded from disk) is"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if faiss.try_extract_index_ivf(inner) is not None:
+        return "ivfpq"
+    if isinstance(inner, faiss.IndexScalarQuantizer):
+        return "sq8"
+    return "flat"
+
+
+def configure_search(index, config: FAISSConfig = None):
+    """Apply the query-time knobs (efSearch, nprobe); they are not fixed at build time"""
+    config = config or faiss_config
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.hnsw.efSearch = config.hnsw_ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.ivf_nprobe, ivf.nlist)
+
+
+def supports_remove(index) -> bool:
+    """HNSW graphs cannot drop vectors in place; they are rebuilt instead"""
+    return index_type_of(index) != "hnsw"
+
+
+def stores_exact_vectors(index) -> bool:
+    """Whether reconstructed vectors are the originals (safe to rebuild or retrain from)"""
+    return index_type_of(index) in ("flat", "hnsw")
+
+
+def exact_vectors(index: faiss.IndexIDMap2, exclude: Iterable[int] = ()) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors) stored in a flat or HNSW index, leaving out excluded IDs"""
+    ids = faiss.vector_to_array(index.id_map)
+    if not index.ntotal:
+        return ids, np.zeros((0, index.d), dtype=np.float32)
+    vectors = index.index.reconstruct_n(0, index.ntotal)
+    exclude = set(exclude)
+    if exclude:
+        keep = np.fromiter((vector_id not in exclude for vector_id in ids.tolist()), dtype=bool, count=len(ids))
+        ids, vectors = ids[keep], vectors[keep]
+    return ids, vectors
+
+
+def copy_vectors(source: faiss.IndexIDMap2, target: faiss.IndexIDMap2, exclude: Iterable[int] = ()):
+    """Add the vectors of an exact index to a (trained) target index"""
+    ids, vectors = exact_vectors(source, exclude)
+    if len(ids):
+        target.add_with_ids(vectors, ids)
+
+
+def rebuild(index: faiss.IndexIDMap2, index_type: str = None, exclude: Iterable[int] = (),
+            config: FAISSConfig = None) -> faiss.IndexIDMap2:
+    """Copy the vectors of an exact index into a new index, leaving out excluded IDs"""
+    config = config or faiss_config
+    index_type = index_type or config.index_type
+    ids, vectors = exact_vectors(index, exclude)
+    if not can_build(index_type, len(ids), config):
+        index_type = "flat"
+    new_index = build_index(index.d, index_type, vectors, config)
+    if len(ids):
+        new_index.add_with_ids(vectors, ids)
+    return new_index
+
+
+def bytes_per_vector(index, mapped: bool = False) -> float:
+    """Approximate resident bytes per stored vector, ID mapping included
+
+    With mapped=True (loaded with MMAP_FLAG) the flat codes of flat, HNSW and
+    SQ8 indexes live in the page cache and are not counted, where faiss maps them.
+    """
+    mapped = mapped and MAPS_FLAT_CODES
+    index_type = index_type_of(index)
+    if index_type == "hnsw":
+        # float32 storage plus ~2*M level-0 links and a level entry
+        size = (0 if mapped else index.d * 4) + _hnsw(index).hnsw.nb_neighbors(0) * 4 + 4
+    elif index_type == "ivfpq":
+        size = faiss.extract_index_ivf(index).code_size + IVF_ID_BYTES
+    elif index_type == "sq8":
+        size = 0 if mapped else faiss.downcast_index(index.index).code_size
+    else:
+        size = 0 if mapped else index.d * 4
+    return size + ID_MAP_BYTES_PER_VECTOR
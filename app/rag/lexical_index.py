@@ -0,0 +1,127 @@
+"""
+Per-shard BM25 Index
+
+Inverted index over the chunks of one user shard. It is updated as chunks are
+added and deleted (WAL replay included) and saved with every snapshot.
+
+Job descriptions are full of exact terms (framework names, certifications,
+acronyms) that the embedding model blurs together. BM25 matches them
+exactly, and hybrid search fuses its scores with the dense ones.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from .config import faiss_config
+
+# Keeps terms like "c++", "c#", "node.js", "ci/cd" and "gpt-4" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+SEPARATORS = re.compile(r"[./-]")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have i in is it its of on or our that the their this to was
+we were will with you your
+""".split())
+# Rough resident cost of one posting (a dict entry holding two ints)
+POSTING_BYTES = 100
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; compound terms also yield their parts ("aws-certified" -> "aws", "certified")"""
+    terms = []
+    for term in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(term)
+        if SEPARATORS.search(term):
+            terms.extend(part for part in SEPARATORS.split(term) if part)
+    return [term for term in terms if term not in STOPWORDS]
+
+
+class InvertedIndex:
+    """term -> {vector ID: term frequency}, plus chunk lengths for BM25"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.posting_count = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, vector_id: int, text: str):
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[vector_id] = frequency
+        self.posting_count += len(counts)
+        length = sum(counts.values())
+        self.lengths[vector_id] = length
+        self.total_length += length
+
+    def remove(self, vector_id: int, text: str):
+        """Drop a chunk; text must be the one it was added with"""
+        if vector_id not in self.lengths:
+            return
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None and postings.pop(vector_id, None) is not None:
+                self.posting_count -= 1
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(vector_id)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """The k chunks with the highest BM25 score for query, as (vector ID, score)"""
+        if not self.lengths:
+            return []
+        k1, b = faiss_config.bm25_k1, faiss_config.bm25_b
+        count = len(self.lengths)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for vector_id, frequency in postings.items():
+                norm = k1 * (1 - b + b * self.lengths[vector_id] / average_length)
+                scores[vector_id] = scores.get(vector_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def estimate_bytes(self) -> int:
+        return self.posting_count * POSTING_BYTES
+
+    def state(self) -> Dict[str, Any]:
+        return {"postings": self.postings, "lengths": self.lengths}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "InvertedIndex":
+        index = cls()
+        index.postings = state["postings"]
+        index.lengths = state["lengths"]
+        index.total_length = sum(index.lengths.values())
+        index.posting_count = sum(len(postings) for postings in index.postings.values())
+        return index
+
+
+def _normalize(scores: Dict[int, float]) -> Dict[int, float]:
+    """Min-max scale scores to [0, 1]"""
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {vector_id: 1.0 for vector_id in scores}
+    return {vector_id: (score - low) / (high - low) for vector_id, score in scores.items()}
+
+
+def fuse_scores(dense: List[Tuple[int, float]], lexical: List[Tuple[int, float]], alpha: float) -> Dict[int, float]:
+    """Weighted sum of normalized scores; dense hits are (vector ID, L2 distance)
+
+    A chunk found by only one retriever gets 0 from the other.
+    """
+    dense_scores = _normalize({vector_id: -distance for vector_id, distance in dense})
+    lexical_scores = _normalize(dict(lexical))
+    return {
+        vector_id: alpha * dense_scores.get(vector_id, 0.0) + (1 - alpha) * lexical_scores.get(vector_id, 0.0)
+        for vector_id in dense_scores.keys() | lexical_scores.keys()
+    }
@@ -0,0 +1,206 @@
+"""
+Document and Chunk Metadata Store
+
+Embedded SQLite database (``<persist_directory>/metadata.db``) with one row
+per document and one row per chunk, indexed by user and by document. It
+replaces the pickled document list: every change is a small transaction, and
+lookups, deletes and per-user statistics are index seeks rather than scans
+over the whole corpus. The database runs in WAL mode, so read-only worker
+processes can query it while the writer updates it.
+
+Chunk rows mirror the vector IDs held by each user shard. Shards write them
+as they apply changes (WAL replay included) and resynchronize them on load,
+so the mirror is repaired after a crash. ``text_offset`` locates the chunk's
+text in the shard's current text file (see ``text_store``). Every change to a
+user's chunk rows also bumps their corpus version, which keys cached
+generations.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+
+class MetadataStore:
+    """Indexed document and chunk metadata in SQLite"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Connection and schema, created on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Chunk rows are rebuilt from the shard WALs, so commits need not fsync
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    uid TEXT NOT NULL,
+                    document_type TEXT,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    metadata TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS documents_uid ON documents (uid, document_type)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    uid TEXT NOT NULL,
+                    vector_id INTEGER NOT NULL,
+                    document_id TEXT,
+                    chunk_id INTEGER,
+                    text_offset INTEGER,
+                    PRIMARY KEY (uid, vector_id)
+                ) WITHOUT ROWID
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+            # Columns added after the table was first created
+            if "text_offset" not in columns:
+                conn.execute("ALTER TABLE chunks ADD COLUMN text_offset INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document_id, uid)")
+            # Never reset, so a cleared and re-filled corpus can't repeat an earlier version
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS corpus_versions (
+                    uid TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    # --- Documents ---
+    def add_documents(self, documents: Iterable[Tuple[str, str, Dict[str, Any], int]]):
+        """Insert or replace (document_id, uid, metadata, chunk_count) rows in one transaction"""
+        rows = [
+            (document_id, uid, metadata.get("document_type"), chunk_count, json.dumps(metadata, default=str))
+            for document_id, uid, metadata, chunk_count in documents
+        ]
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (document_id, uid, document_type, chunk_count, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def add_document(self, document_id: str, uid: str, metadata: Dict[str, Any], chunk_count: int):
+        self.add_documents([(document_id, uid, metadata, chunk_count)])
+
+    def remove_document(self, document_id: str) -> bool:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount > 0
+
+    def document_owners(self, document_id: str) -> Set[str]:
+        """Shards holding a document's chunks (also finds chunks whose document row is missing)"""
+        rows = self._query(
+            "SELECT uid FROM documents WHERE document_id = ? UNION SELECT uid FROM chunks WHERE document_id = ?",
+            (document_id, document_id)
+        )
+        return {uid for uid, in rows}
+
+    def document_count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM documents")[0][0]
+
+    def user_stats(self, uid: str) -> Dict[str, Any]:
+        """Document and chunk counts for one user, by document type"""
+        rows = self._query(
+            "SELECT document_type, COUNT(*), SUM(chunk_count) FROM documents WHERE uid = ? GROUP BY document_type",
+            (uid,)
+        )
+        by_type = {document_type or "unknown": {"documents": documents, "chunks": chunks or 0}
+                   for document_type, documents, chunks in rows}
+        return {
+            "documents": sum(entry["documents"] for entry in by_type.values()),
+            "chunks": self.chunk_count(uid),
+            "by_type": by_type
+        }
+
+    # --- Chunks ---
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection, uid: str):
+        conn.execute(
+            "INSERT INTO corpus_versions (uid, version) VALUES (?, 1) "
+            "ON CONFLICT (uid) DO UPDATE SET version = version + 1",
+            (uid,)
+        )
+
+    def corpus_version(self, uid: str) -> int:
+        """Counter bumped by every change to a user's chunks; it only ever increases"""
+        rows = self._query("SELECT version FROM corpus_versions WHERE uid = ?", (uid,))
+        return rows[0][0] if rows else 0
+
+    def add_chunks(self, uid: str, vector_ids: Iterable[int], metadatas: Iterable[Dict[str, Any]],
+                   text_offsets: Iterable[int]):
+        rows = [
+            (uid, int(vector_id), metadata.get("document_id"), metadata.get("chunk_id"), text_offset)
+            for vector_id, metadata, text_offset in zip(vector_ids, metadatas, text_offsets)
+        ]
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (uid, vector_id, document_id, chunk_id, text_offset) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._bump_version(conn, uid)
+
+    def remove_chunks(self, uid: str, document_id: str) -> int:
+        with self._transaction() as conn:
+            self._bump_version(conn, uid)
+            return conn.execute(
+                "DELETE FROM chunks WHERE document_id = ? AND uid = ?", (document_id, uid)
+            ).rowcount
+
+    def chunk_count(self, uid: str) -> int:
+        return self._query("SELECT COUNT(*) FROM chunks WHERE uid = ?", (uid,))[0][0]
+
+    def sync_shard(self, uid: str, chunks: Mapping[int, Dict[str, Any]]):
+        """Replace a user's chunk rows with the chunks a shard actually holds"""
+        rows = [
+            (uid, int(vector_id), chunk["metadata"].get("document_id"), chunk["metadata"].get("chunk_id"),
+             chunk.get("text_offset"))
+            for vector_id, chunk in chunks.items()
+        ]
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chunks WHERE uid = ?", (uid,))
+            conn.executemany(
+                "INSERT INTO chunks (uid, vector_id, document_id, chunk_id, text_offset) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._bump_version(conn, uid)
+
+    def remove_shard(self, uid: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chunks WHERE uid = ?", (uid,))
+            self._bump_version(conn, uid)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM documents")
+            conn.execute("UPDATE corpus_versions SET version = version + 1")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,692 @@
+"""
+Per-user FAISS Shards
+
+This module keeps every user's vectors in their own FAISS index under
+``<persist_directory>/<shards_directory>/<uid>``. Shards are loaded on first
+access and evicted in least-recently-used order once the loaded shards exceed
+the configured memory budget, so retrieval only ever touches one user's corpus.
+
+Each chunk gets a stable integer vector ID held in an ``IndexIDMap2`` around
+the configured ANN index (see ``index_factory``). Deleting a document
+tombstones its IDs in O(chunks in the document); a background compaction pass
+later removes the tombstoned vectors from the index itself, and moves shards
+that have grown large enough onto a trained index type.
+
+Mutations are appended to the shard's write-ahead log and only folded into a
+versioned snapshot (``snapshot-<lsn>/`` published through ``CURRENT``) by
+periodic checkpoints, so an upload never pays for rewriting the index.
+
+When several worker processes share the data directory, one of them writes
+and the others open shards read-only: they memory-map the published
+snapshot's index and chunk table, so the data is shared through the page
+cache, and they switch to a newer snapshot as soon as ``CURRENT`` moves.
+
+Chunk text is kept off the heap in the shard's append-only text file (see
+``text_store``); chunk records only hold the offset of their text. A BM25
+index over the same chunks (see ``lexical_index``) backs hybrid search.
+"""
+
+import asyncio
+import os
+import re
+import pickle
+import shutil
+import threading
+import heapq
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Any
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from .chunk_table import ChunkTable, write_chunk_table
+from .config import faiss_config
+from .lexical_index import InvertedIndex, fuse_scores
+from .text_store import TextStore
+from .index_factory import (
+    MMAP_FLAG, build_index, bytes_per_vector, can_build, configure_search, copy_vectors,
+    exact_vectors, index_type_of, rebuild, stores_exact_vectors, supports_remove
+)
+from .wal import GroupCommitter, WriteAheadLog, group_committer
+
+
+def shard_dirname(uid: str) -> str:
+    """Map a user ID to a filesystem-safe shard directory name"""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", uid) or "_"
+
+
+class UserShard:
+    """A single user's ID-mapped FAISS index and its chunk metadata"""
+
+    CURRENT_FILE = "CURRENT"
+    INDEX_FILE = "index.faiss"
+    CHUNKS_FILE = "chunks.pkl"
+    STATE_FILE = "state.pkl"
+    LEXICAL_FILE = "lexical.pkl"
+    WAL_FILE = "wal.log"
+
+    def __init__(self, uid: str, path: str, embedding_service, committer: GroupCommitter = None,
+                 read_only: bool = False, metadata_store=None):
+        self.uid = uid
+        self.path = path
+        self.embedding_service = embedding_service  # only needed to read LangChain-format shards
+        # Readers map published snapshots and never write
+        self.read_only = read_only
+        self.snapshot_name: Optional[str] = None
+        self.index: Optional[faiss.IndexIDMap2] = None
+        self.chunks: Mapping[int, Dict[str, Any]] = {}  # vector ID -> {"metadata", "text_offset"}
+        self.document_ids: Dict[str, List[int]] = {}  # document ID -> vector IDs
+        self.tombstones = set()  # vector IDs deleted but still in the index
+        self.next_id = 0
+        self.texts: Optional[TextStore] = None
+        self.text_bytes = 0  # bytes of live records in the text file
+        self.lexical = InvertedIndex()
+        self.lock = threading.RLock()
+        # Indexed mirror of the chunk rows (see metadata_store)
+        self.metadata = metadata_store
+
+        # Mutations are logged to the WAL and periodically folded into a snapshot
+        self.wal = WriteAheadLog(os.path.join(path, self.WAL_FILE))
+        self.committer = committer or group_committer
+        self.lsn = 0
+        self.checkpoint_lsn = 0
+        self._last_commit: Optional[Future] = None
+
+    @classmethod
+    def is_shard_dir(cls, path: str) -> bool:
+        return any(
+            os.path.exists(os.path.join(path, name))
+            for name in (cls.CURRENT_FILE, cls.INDEX_FILE, cls.WAL_FILE)
+        )
+
+    def exists(self) -> bool:
+        """Whether the shard has been persisted to disk"""
+        return self.is_shard_dir(self.path)
+
+    def _current_snapshot(self) -> Optional[str]:
+        """Name of the snapshot CURRENT points at, if any"""
+        try:
+            with open(os.path.join(self.path, self.CURRENT_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _snapshot_dir(self) -> Optional[str]:
+        """Directory of the latest published snapshot, if any"""
+        name = self._current_snapshot()
+        if name is not None:
+            return os.path.join(self.path, name)
+        if os.path.exists(os.path.join(self.path, self.INDEX_FILE)):
+            # Shards written before snapshots were versioned
+            return self.path
+        return None
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the WAL holds records not yet covered by a snapshot"""
+        return self.lsn > self.checkpoint_lsn
+
+    @property
+    def committing(self) -> bool:
+        """Whether WAL records are still waiting for the group committer"""
+        return self._last_commit is not None and not self._last_commit.done()
+
+    def load(self):
+        """Load the latest snapshot and replay the WAL on top of it"""
+        with self.lock:
+            if self.read_only:
+                self._load_published()
+                return
+            snapshot = self._snapshot_dir()
+            if snapshot is not None:
+                if ChunkTable.exists(snapshot):
+                    self._load_snapshot(snapshot)
+                elif os.path.exists(os.path.join(snapshot, self.CHUNKS_FILE)):
+                    self._load_pickled_snapshot(snapshot)
+                else:
+                    self._load_langchain_layout()
+            if self.texts is None:
+                self._open_texts()
+            moved_texts = self._store_legacy_texts()
+
+            for lsn, record in self.wal.replay(after_lsn=self.checkpoint_lsn):
+                self._apply(record)
+                self.lsn = lsn
+            self._sync_metadata(force=moved_texts)
+            if moved_texts:
+                self.checkpoint(force=True)
+
+    def _sync_metadata(self, force: bool = False):
+        """Rebuild the chunk rows if they drifted from the shard (e.g. after a crash or an upgrade)"""
+        if self.metadata is not None and (force or self.metadata.chunk_count(self.uid) != len(self.chunks)):
+            self.metadata.sync_shard(self.uid, self.chunks)
+
+    def _load_published(self, attempts: int = 3):
+        """Reader side: map the snapshot CURRENT points at
+        
+        WAL records belong to the writer, which publishes a snapshot shortly
+        after every write, so they are not replayed here.
+        """
+        for attempt in range(attempts):
+            name = self._current_snapshot()
+            snapshot = os.path.join(self.path, name) if name else None
+            try:
+                if snapshot is not None and ChunkTable.exists(snapshot):
+                    self._load_snapshot(snapshot)
+                elif snapshot is not None and os.path.exists(os.path.join(snapshot, self.CHUNKS_FILE)):
+                    self._load_pickled_snapshot(snapshot)
+                self.snapshot_name = name
+                return
+            except FileNotFoundError:
+                # The writer replaced the snapshot while it was being opened
+                if attempt == attempts - 1:
+                    raise
+
+    @property
+    def stale(self) -> bool:
+        """Reader side: whether the writer has published a newer snapshot"""
+        return self.read_only and self._current_snapshot() != self.snapshot_name
+
+    def refresh(self) -> bool:
+        """Reader side: switch to a newer snapshot if the writer has published one"""
+        if not self.stale:
+            return False
+        with self.lock:
+            self.index = None
+            self.chunks = {}
+            self.texts = None
+            self.lexical = InvertedIndex()
+            self.tombstones = set()
+            self._load_published()
+            return True
+
+    def _load_snapshot(self, snapshot: str):
+        if self.read_only:
+            # Flat codes (flat, HNSW and SQ8 storage) stay in the page cache, shared between workers
+            self.index = faiss.read_index(
+                os.path.join(snapshot, self.INDEX_FILE), MMAP_FLAG | faiss.IO_FLAG_READ_ONLY
+            )
+        else:
+            self.index = faiss.read_index(os.path.join(snapshot, self.INDEX_FILE))
+        configure_search(self.index)
+        with open(os.path.join(snapshot, self.STATE_FILE), 'rb') as f:
+            state = pickle.load(f)
+        self.tombstones = state["tombstones"]
+        self.next_id = state["next_id"]
+        self.lsn = self.checkpoint_lsn = state["lsn"]
+        self._open_texts(state.get("text_file"), state.get("text_size", 0))
+        self.text_bytes = state.get("text_bytes", 0)
+        table = ChunkTable(snapshot)
+        if self.read_only:
+            # Records are unpickled on lookup; readers never need the per-document index
+            self.chunks = table
+            self.document_ids = {}
+        else:
+            self.chunks = dict(table.items())
+            self._index_documents()
+        self._load_lexical(snapshot)
+
+    def _load_pickled_snapshot(self, snapshot: str):
+        """Snapshots written before chunk tables hold all state in one pickle"""
+        self.index = faiss.read_index(os.path.join(snapshot, self.INDEX_FILE))
+        configure_search(self.index)
+        with open(os.path.join(snapshot, self.CHUNKS_FILE), 'rb') as f:
+            state = pickle.load(f)
+        self.chunks = state["chunks"]
+        self.tombstones = state["tombstones"]
+        self.next_id = state["next_id"]
+        self.lsn = self.checkpoint_lsn = state.get("lsn", 0)
+        self._index_documents()
+        self._load_lexical(snapshot)
+
+    def _index_documents(self):
+        self.document_ids = {}
+        for vector_id, chunk in self.chunks.items():
+            document_id = chunk["metadata"].get("document_id")
+            self.document_ids.setdefault(document_id, []).append(vector_id)
+
+    def _load_lexical(self, snapshot: str):
+        """Load the snapshot's BM25 index, or build it for snapshots written without one"""
+        path = os.path.join(snapshot, self.LEXICAL_FILE)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self.lexical = InvertedIndex.from_state(pickle.load(f))
+            return
+        self.lexical = InvertedIndex()
+        for vector_id, chunk in self.chunks.items():
+            self.lexical.add(vector_id, self._text(chunk))
+
+    def _open_texts(self, name: Optional[str] = None, size: int = 0):
+        """Open the text file a snapshot refers to, or start a new one"""
+        if name is None:
+            name = f"texts-{uuid.uuid4().hex[:8]}.bin"
+        self.texts = TextStore(os.path.join(self.path, name), size, writable=not self.read_only)
+
+    def _store_legacy_texts(self) -> bool:
+        """Move chunk text held in the records of older snapshots into the text file"""
+        legacy = [vector_id for vector_id, chunk in self.chunks.items() if "text" in chunk]
+        if not legacy:
+            return False
+        start = self.texts.size
+        offsets = self.texts.append(self.chunks[vector_id]["text"] for vector_id in legacy)
+        for vector_id, offset in zip(legacy, offsets):
+            self.chunks[vector_id] = {"metadata": self.chunks[vector_id]["metadata"], "text_offset": offset}
+        self.text_bytes += self.texts.size - start
+        return True
+
+    def _text(self, chunk: Dict[str, Any]) -> str:
+        # Readers of snapshots written before the text file find the text in the record
+        return chunk["text"] if "text" in chunk else self.texts.read(chunk["text_offset"])
+
+    def _load_langchain_layout(self):
+        """Convert a shard saved through LangChain's FAISS.save_local"""
+        from langchain_community.vectorstores import FAISS
+        legacy = FAISS.load_local(self.path, self.embedding_service.get_embeddings())
+        self._open_texts()
+        texts, vectors, metadatas = [], [], []
+        for position, docstore_id in legacy.index_to_docstore_id.items():
+            doc = legacy.docstore.search(docstore_id)
+            texts.append(doc.page_content)
+            vectors.append(legacy.index.reconstruct(position))
+            metadatas.append(doc.metadata)
+        if texts:
+            ids = np.arange(len(texts), dtype=np.int64)
+            self._apply_add(ids, np.asarray(vectors, dtype=np.float32), texts, metadatas)
+        self.checkpoint(force=True)
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """Publish a snapshot covering every logged record and truncate the WAL"""
+        with self.lock:
+            if self.read_only or self.index is None or not (self.dirty or force):
+                return False
+            # The suffix keeps a forced checkpoint at the same LSN from overwriting the live snapshot
+            name = f"snapshot-{self.lsn:012d}-{uuid.uuid4().hex[:8]}"
+            snapshot = os.path.join(self.path, name)
+            os.makedirs(snapshot, exist_ok=True)
+            faiss.write_index(self.index, os.path.join(snapshot, self.INDEX_FILE))
+            write_chunk_table(snapshot, self.chunks)
+            self.texts.sync()
+            with open(os.path.join(snapshot, self.LEXICAL_FILE), 'wb') as f:
+                pickle.dump(self.lexical.state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(snapshot, self.STATE_FILE), 'wb') as f:
+                pickle.dump({
+                    "tombstones": self.tombstones,
+                    "next_id": self.next_id,
+                    "lsn": self.lsn,
+                    "text_file": self.texts.name,
+                    "text_size": self.texts.size,
+                    "text_bytes": self.text_bytes
+                }, f)
+
+            # Switching CURRENT is the atomic publish step
+            tmp_path = os.path.join(self.path, self.CURRENT_FILE + ".tmp")
+            with open(tmp_path, 'w') as f:
+                f.write(name)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.path, self.CURRENT_FILE))
+
+            self.checkpoint_lsn = self.lsn
+            self.snapshot_name = name
+            self.wal.truncate()
+            self._remove_stale_snapshots(keep=name)
+            return True
+
+    def _remove_stale_snapshots(self, keep: str):
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith("snapshot-") and name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.startswith("texts-") and name != self.texts.name:
+                # Replaced by a compaction; readers still mapping it keep their pages
+                os.remove(path)
+            elif name in (self.INDEX_FILE, self.CHUNKS_FILE, "index.pkl"):
+                # Files from the pre-snapshot layouts
+                os.remove(path)
+
+    def _log(self, record: Dict[str, Any]) -> Future:
+        """Assign the next LSN to a record and hand it to the group committer"""
+        self.lsn += 1
+        self._last_commit = self.committer.submit(self.wal, self.lsn, record)
+        return self._last_commit
+
+    def _apply(self, record: Dict[str, Any]):
+        if record["op"] == "add":
+            self._apply_add(record["ids"], record["vectors"], record["texts"], record["metadatas"])
+        elif record["op"] == "delete":
+            self._apply_delete(record["document_id"])
+
+    def _apply_add(self, ids: np.ndarray, matrix: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        if self.index is None:
+            # Trained index types have nothing to train on yet; convert_index() switches later
+            index_type = faiss_config.index_type
+            self.index = build_index(matrix.shape[1], index_type if can_build(index_type, 0) else "flat")
+        self.index.add_with_ids(matrix, ids)
+        self.next_id = max(self.next_id, int(ids.max()) + 1)
+        start = self.texts.size
+        offsets = self.texts.append(texts)
+        for vector_id, offset, text, metadata in zip(ids.tolist(), offsets, texts, metadatas):
+            self.chunks[vector_id] = {"metadata": metadata, "text_offset": offset}
+            self.document_ids.setdefault(metadata.get("document_id"), []).append(vector_id)
+            self.lexical.add(vector_id, text)
+        self.text_bytes += self.texts.size - start
+        if self.metadata is not None:
+            self.metadata.add_chunks(self.uid, ids.tolist(), metadatas, offsets)
+
+    def _apply_delete(self, document_id: str) -> int:
+        vector_ids = self.document_ids.pop(document_id, [])
+        for vector_id in vector_ids:
+            chunk = self.chunks.pop(vector_id, None)
+            if chunk is not None:
+                self.lexical.remove(vector_id, self._text(chunk))
+                self.text_bytes -= self.texts.record_size(chunk["text_offset"])
+            self.tombstones.add(vector_id)
+        if vector_ids and self.metadata is not None:
+            self.metadata.remove_chunks(self.uid, document_id)
+        return len(vector_ids)
+
+    def add_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict[str, Any]]) -> Optional[Future]:
+        """Add pre-computed chunk embeddings
+        
+        The chunks are searchable immediately; the returned future resolves
+        once their WAL record is durable.
+        """
+        if not texts:
+            return None
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self.lock:
+            ids = np.arange(self.next_id, self.next_id + len(texts), dtype=np.int64)
+            self._apply_add(ids, matrix, texts, metadatas)
+            return self._log({
+                "op": "add",
+                "ids": ids,
+                "vectors": matrix,
+                "texts": texts,
+                "metadatas": metadatas
+            })
+
+    def delete_document(self, document_id: str) -> Optional[Future]:
+        """Tombstone a document's vectors in O(chunks in the document)"""
+        with self.lock:
+            if not self._apply_delete(document_id):
+                return None
+            return self._log({"op": "delete", "document_id": document_id})
+
+    def compact(self) -> int:
+        """Physically remove tombstoned vectors; returns the number reclaimed"""
+        with self.lock:
+            if not self.tombstones or self.index is None:
+                return 0
+            if supports_remove(self.index):
+                removed = self.index.remove_ids(
+                    np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+                )
+            else:
+                ntotal = self.index.ntotal
+                self.index = rebuild(self.index, index_type_of(self.index), exclude=self.tombstones)
+                removed = ntotal - self.index.ntotal
+            self.tombstones.clear()
+            if self.texts.size - self.text_bytes > faiss_config.text_garbage_ratio * self.texts.size:
+                self._rewrite_texts()
+            return removed
+
+    def _rewrite_texts(self):
+        """Copy the live chunk texts into a new file, leaving deleted chunks' records behind
+        
+        The old file is removed by the next checkpoint, once no snapshot refers to it.
+        """
+        texts = TextStore(os.path.join(self.path, f"texts-{uuid.uuid4().hex[:8]}.bin"))
+        vector_ids = list(self.chunks)
+        offsets = texts.copy_records(self.texts, [self.chunks[vector_id]["text_offset"] for vector_id in vector_ids])
+        for vector_id, offset in zip(vector_ids, offsets):
+            self.chunks[vector_id]["text_offset"] = offset
+        self.texts.close()
+        self.texts = texts
+        self.text_bytes = texts.size
+        if self.metadata is not None:
+            self.metadata.sync_shard(self.uid, self.chunks)
+
+    def _should_convert(self, index_type: str) -> bool:
+        return (
+            self.index is not None
+            and index_type_of(self.index) != index_type
+            and stores_exact_vectors(self.index)
+            and can_build(index_type, self.index.ntotal - len(self.tombstones))
+        )
+
+    def convert_index(self) -> bool:
+        """Move the shard onto the configured index type once it can be built"""
+        index_type = faiss_config.index_type
+        with self.lock:
+            if not self._should_convert(index_type):
+                return False
+            _, training_vectors = exact_vectors(self.index, exclude=self.tombstones)
+        # Training can take seconds; searches and adds carry on meanwhile
+        index = build_index(training_vectors.shape[1], index_type, training_vectors)
+        with self.lock:
+            if not self._should_convert(index_type):
+                return False
+            previous = index_type_of(self.index)
+            copy_vectors(self.index, index, exclude=self.tombstones)
+            self.index = index
+            self.tombstones.clear()
+        print(f"Converted shard {self.uid} from {previous} to {index_type} ({index.ntotal} vectors)")
+        return True
+
+    @property
+    def size(self) -> int:
+        """Number of live (non-deleted) vectors in the shard"""
+        return len(self.chunks)
+
+    def estimate_bytes(self) -> int:
+        """Rough resident size: index storage and IDs plus the BM25 postings
+        
+        Chunk text and memory-mapped snapshot data live in the shared page cache and are not counted.
+        """
+        if self.index is None:
+            return 0
+        return int(self.index.ntotal * bytes_per_vector(self.index, mapped=self.read_only)) + self.lexical.estimate_bytes()
+
+    def _nearest(self, embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """(vector ID, L2 distance) of the k nearest live chunks"""
+        # Over-fetch so that tombstoned hits don't starve the result
+        fetch_k = min(k + len(self.tombstones), self.index.ntotal)
+        query = np.asarray([embedding], dtype=np.float32)
+        distances, ids = self.index.search(query, fetch_k)
+
+        results = []
+        for distance, vector_id in zip(distances[0].tolist(), ids[0].tolist()):
+            if vector_id not in self.chunks:
+                continue
+            results.append((vector_id, distance))
+            if len(results) == k:
+                break
+        return results
+
+    def _document(self, vector_id: int) -> Document:
+        chunk = self.chunks[vector_id]
+        return Document(page_content=self._text(chunk), metadata=chunk["metadata"])
+
+    def _stored_vectors(self, vector_ids: List[int]) -> Optional[np.ndarray]:
+        """Vectors of the given chunks as the index holds them (decoded for SQ8)
+        
+        None if the index cannot reconstruct by ID (IVF lists have no direct map).
+        """
+        if not vector_ids:
+            return np.zeros((0, self.index.d), dtype=np.float32)
+        try:
+            return self.index.reconstruct_batch(np.asarray(vector_ids, dtype=np.int64))
+        except RuntimeError:
+            return None
+
+    def _results(self, hits: List[Tuple[int, float]], return_vectors: bool):
+        results = [(self._document(vector_id), score) for vector_id, score in hits]
+        if not return_vectors:
+            return results
+        return results, self._stored_vectors([vector_id for vector_id, score in hits])
+
+    def search_by_vector(self, embedding: List[float], k: int, return_vectors: bool = False):
+        """Return the k nearest live chunks with their L2 distances
+        
+        With return_vectors, returns (results, stored vectors of the results).
+        """
+        with self.lock:
+            hits = self._nearest(embedding, k) if self.size else []
+            return self._results(hits, return_vectors)
+
+    def search_hybrid(self, query: str, embedding: List[float], k: int, return_vectors: bool = False):
+        """Return the k best live chunks by fused dense and BM25 score (higher is better)
+        
+        With return_vectors, returns (results, stored vectors of the results).
+        """
+        with self.lock:
+            if self.size == 0:
+                return self._results([], return_vectors)
+            # Each retriever contributes a wider candidate list than the final k
+            fetch_k = k * faiss_config.hybrid_candidates
+            scores = fuse_scores(
+                self._nearest(embedding, fetch_k),
+                self.lexical.search(query, fetch_k),
+                faiss_config.hybrid_alpha
+            )
+            return self._results(heapq.nlargest(k, scores.items(), key=lambda item: item[1]), return_vectors)
+
+
+class ShardManager:
+    """Lazily loads user shards and evicts them under a memory budget"""
+
+    def __init__(self, root: str, embedding_service, memory_budget_bytes: int = None, read_only: bool = False,
+                 metadata_store=None):
+        if memory_budget_bytes is None:
+            memory_budget_bytes = faiss_config.shard_memory_budget_mb * 1024 * 1024
+        self.root = root
+        self.embedding_service = embedding_service
+        self.memory_budget_bytes = memory_budget_bytes
+        # Reader processes open published snapshots only
+        self.read_only = read_only
+        self.metadata_store = metadata_store
+        self._shards: "OrderedDict[str, UserShard]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def shard_path(self, uid: str) -> str:
+        return os.path.join(self.root, shard_dirname(uid))
+
+    def _resident(self, uid: str) -> Optional[UserShard]:
+        with self._lock:
+            shard = self._shards.get(uid)
+            if shard is not None:
+                self._shards.move_to_end(uid)
+            return shard
+
+    def get(self, uid: str, create: bool = False) -> Optional[UserShard]:
+        """Return the user's shard, loading it from disk on first access
+        
+        Loading a cold shard blocks; async callers go through ``get_async``.
+        """
+        shard = self._resident(uid)
+        if shard is not None:
+            shard.refresh()
+            return shard
+
+        if create and self.read_only:
+            raise RuntimeError("Shards are read-only in this process; the writer process creates them")
+        with self._lock:
+            load_lock = self._load_locks.setdefault(uid, threading.Lock())
+        # Only loads of the same user wait on each other
+        with load_lock:
+            shard = self._resident(uid)
+            if shard is not None:
+                return shard
+            shard = UserShard(
+                uid, self.shard_path(uid), self.embedding_service,
+                read_only=self.read_only, metadata_store=self.metadata_store
+            )
+            if not shard.exists() and not create:
+                return None
+            shard.load()
+            with self._lock:
+                self._shards[uid] = shard
+                self._load_locks.pop(uid, None)
+                self._evict(keep=uid)
+            return shard
+
+    async def get_async(self, uid: str, create: bool = False) -> Optional[UserShard]:
+        """Like ``get``, but a cold (or republished) shard is loaded in a worker thread
+        
+        Reading the snapshot, the BM25 index and replaying the WAL can take a
+        while, and the event loop keeps serving other requests meanwhile.
+        """
+        shard = self._resident(uid)
+        if shard is not None and not shard.stale:
+            return shard
+        return await asyncio.to_thread(self.get, uid, create)
+
+    def touch(self, uid: str):
+        """Re-check the memory budget after a shard has grown"""
+        with self._lock:
+            self._evict(keep=uid)
+
+    def _evict(self, keep: str = None):
+        """Drop least recently used shards until under the memory budget"""
+        total = sum(shard.estimate_bytes() for shard in self._shards.values())
+        for uid in list(self._shards.keys()):
+            if total <= self.memory_budget_bytes:
+                break
+            if uid == keep or self._shards[uid].committing:
+                # Records still queued for the WAL would be missed by a reload
+                continue
+            shard = self._shards.pop(uid)
+            total -= shard.estimate_bytes()
+
+    def loaded(self) -> List[UserShard]:
+        """Shards currently resident in memory"""
+        with self._lock:
+            return list(self._shards.values())
+
+    def uids(self) -> Iterator[str]:
+        """User IDs of every shard on disk or in memory"""
+        with self._lock:
+            seen = set(self._shards.keys())
+        yield from seen
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name not in seen and UserShard.is_shard_dir(os.path.join(self.root, name)):
+                    yield name
+
+    def drop(self, uid: str):
+        """Remove a user's shard from memory and disk"""
+        with self._lock:
+            self._shards.pop(uid, None)
+            path = self.shard_path(uid)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            if self.metadata_store is not None:
+                self.metadata_store.remove_shard(uid)
+
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(shard.estimate_bytes() for shard in self._shards.values())
+
+    def index_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Shard count, vector count and bytes per vector of loaded shards, by index type"""
+        stats: Dict[str, Dict[str, Any]] = {}
+        for shard in self.loaded():
+            with shard.lock:
+                if shard.index is None:
+                    continue
+                entry = stats.setdefault(index_type_of(shard.index), {"shards": 0, "vectors": 0, "index_bytes": 0})
+                entry["shards"] += 1
+                entry["vectors"] += shard.index.ntotal
+                entry["index_bytes"] += int(shard.index.ntotal * bytes_per_vector(shard.index))
+        for entry in stats.values():
+            entry["bytes_per_vector"] = round(entry["index_bytes"] / entry["vectors"], 1) if entry["vectors"] else None
+        return stats
+
+    def clear(self):
+        """Drop all shards from memory and disk"""
+        with self._lock:
+            self._shards.clear()
+            if os.path.isdir(self.root):
+                shutil.rmtree(self.root)
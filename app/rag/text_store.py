@@ -0,0 +1,146 @@
+"""
+Chunk Text Store
+
+Append-only file (``texts-<id>.bin`` in the shard directory) holding the text
+of a shard's chunks, so chunk texts are not kept on the heap as Python strings.
+Each record is framed as ``<payload length><codec><payload>``: UTF-8 text,
+zstd-compressed when ``text_compression`` is ``zstd``. A chunk refers to its
+text by the byte offset of its record.
+
+The file is read through ``mmap``: texts are paged in from the page cache while
+context is assembled, and reader processes share the pages of the writer's
+file. Records of deleted chunks stay in the file until compaction copies the
+live records into a new one.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, List
+from .config import faiss_config
+
+HEADER = struct.Struct("<IB")
+RAW = 0
+ZSTD = 1
+# Records copied per write when compaction rewrites a file
+COPY_BATCH = 1024
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstandard is required for zstd-compressed chunk text") from e
+    return zstandard
+
+
+class TextStore:
+    """Append-only chunk text records addressed by offset, read through mmap"""
+
+    def __init__(self, path: str, size: int = 0, writable: bool = True):
+        self.path = path
+        self.writable = writable
+        self._file = None
+        self._map = b""
+        self._lock = threading.Lock()
+        self._compressor = None
+        self._decompressor = None
+        if writable and os.path.exists(path) and os.path.getsize(path) > size:
+            # Records past the snapshot belong to WAL records, which are replayed on top
+            os.truncate(path, size)
+        self.size = size
+        if not writable and size:
+            # Map right away, so a file replaced by compaction fails the load rather than a later read
+            self._view(size)
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def _encode(self, text: str) -> bytes:
+        payload = text.encode("utf-8")
+        if faiss_config.text_compression != "zstd":
+            return HEADER.pack(len(payload), RAW) + payload
+        if self._compressor is None:
+            self._compressor = _zstandard().ZstdCompressor(level=faiss_config.text_compression_level)
+        payload = self._compressor.compress(payload)
+        return HEADER.pack(len(payload), ZSTD) + payload
+
+    def append(self, texts: Iterable[str]) -> List[int]:
+        """Append texts and return the offset of each record"""
+        if not self.writable:
+            raise RuntimeError(f"Text store {self.path} is read-only")
+        return self._append_raw([self._encode(text) for text in texts])
+
+    def copy_records(self, source: "TextStore", offsets: Iterable[int]) -> List[int]:
+        """Append records of another store as they are (no re-encoding); returns their new offsets"""
+        offsets = list(offsets)
+        new_offsets = []
+        for start in range(0, len(offsets), COPY_BATCH):
+            batch = offsets[start:start + COPY_BATCH]
+            new_offsets.extend(self._append_raw([source._record(offset) for offset in batch]))
+        return new_offsets
+
+    def _append_raw(self, records: List[bytes]) -> List[int]:
+        offsets = []
+        with self._lock:
+            f = self._open()
+            for record in records:
+                offsets.append(self.size)
+                self.size += len(record)
+            f.write(b"".join(records))
+            # Make the records visible to mmap readers
+            f.flush()
+        return offsets
+
+    def _view(self, end: int):
+        """The mapped file, remapped if it must reach end"""
+        with self._lock:
+            if len(self._map) < end:
+                with open(self.path, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def _record(self, offset: int) -> bytes:
+        view = self._view(offset + HEADER.size)
+        length, _ = HEADER.unpack_from(view, offset)
+        end = offset + HEADER.size + length
+        return self._view(end)[offset:end]
+
+    def record_size(self, offset: int) -> int:
+        """Bytes the record at offset takes up in the file"""
+        length, _ = HEADER.unpack_from(self._view(offset + HEADER.size), offset)
+        return HEADER.size + length
+
+    def read(self, offset: int) -> str:
+        """Text of the record at offset"""
+        record = self._record(offset)
+        _, codec = HEADER.unpack_from(record)
+        payload = record[HEADER.size:]
+        if codec == ZSTD:
+            with self._lock:
+                if self._decompressor is None:
+                    self._decompressor = _zstandard().ZstdDecompressor()
+                payload = self._decompressor.decompress(payload)
+        return payload.decode("utf-8")
+
+    def sync(self):
+        """fsync appended records before a snapshot referring to them is published"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._map = b""
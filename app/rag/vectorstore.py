@@ -1,238 +1,570 @@
+import asyncio
 import faiss
 import numpy as np
 import pickle
 import os
-from typing import List, Dict, Any, Optional, Tuple
-from langchain_community.vectorstores import FAISS
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Dict, Any, Optional, Set, Tuple
+from langchain.docstore.document import Document
 from .config import faiss_config
+from .context_packer import merge_adjacent, mmr, pack_context
 from .embeddings import embedding_service
+from .executor import embedding_executor
+from .metadata_store import MetadataStore
+from .shards import ShardManager
+from .wal import WriteAheadLog
 
 class VectorStore:
-    """Vector store for document storage and retrieval using FAISS"""
+    """Vector store for document storage and retrieval using per-user FAISS shards"""
     
     def __init__(self):
         self.persist_directory = faiss_config.persist_directory
-        self.embeddings = embedding_service.get_embeddings()
         self.text_splitter = embedding_service.get_text_splitter()
         
-        # Initialize FAISS vector store
-        self.vectorstore = None
-        self.documents = []  # Store document metadata
-        self.load_or_create_vectorstore()
+        # Document and chunk metadata, indexed by user and document
+        self.metadata = MetadataStore(os.path.join(self.persist_directory, faiss_config.metadata_db_file))
+        
+        # Each user's vectors live in their own lazily loaded FAISS shard
+        self.shards = ShardManager(
+            os.path.join(self.persist_directory, faiss_config.shards_directory),
+            embedding_service,
+            metadata_store=self.metadata
+        )
+        
+        # Nothing is read from disk until the app starts (or first use)
+        self.loaded = False
+        self._load_lock = threading.RLock()
+        
+        # With shared_index on, only the process holding the writer lock writes
+        self.read_only = False
+        self._writer_lock = None
+        # Shards written since the last publish (shared_index only)
+        self._unpublished: Set[str] = set()
+        self._unpublished_lock = threading.Lock()
+    
+    @property
+    def embeddings(self):
+        """The embedding model (loads it if needed)"""
+        return embedding_service.get_embeddings()
+    
+    def ensure_loaded(self):
+        """Load document metadata and migrate legacy data once"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load_or_create_vectorstore()
+                self.loaded = True
     
     def load_or_create_vectorstore(self):
-        """Load existing FAISS index or create new one"""
-        index_path = os.path.join(self.persist_directory, faiss_config.index_name)
-        docs_path = os.path.join(self.persist_directory, faiss_config.documents_file)
+        """Load document metadata and replay its WAL; shards are loaded on demand"""
+        os.makedirs(self.persist_directory, exist_ok=True)
+        if faiss_config.shared_index and not self._acquire_writer_lock():
+            self.read_only = self.shards.read_only = True
+        
+        if self.read_only:
+            print(f"Opened FAISS vector store read-only with {self.metadata.document_count()} documents")
+            return
         
-        if os.path.exists(index_path) and os.path.exists(docs_path):
+        self.migrate_pickled_catalog()
+        print(f"Loaded FAISS document metadata with {self.metadata.document_count()} documents")
+        
+        self.migrate_legacy_index()
+    
+    def _acquire_writer_lock(self) -> bool:
+        """Become the writer unless another worker process already is"""
+        import fcntl
+        lock_file = open(os.path.join(self.persist_directory, faiss_config.writer_lock_file), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held until the process exits
+        self._writer_lock = lock_file
+        return True
+    
+    def migrate_pickled_catalog(self):
+        """Move a pickled document list (and its WAL) into the metadata store (one-off)"""
+        docs_path = os.path.join(self.persist_directory, faiss_config.documents_file)
+        catalog_wal = WriteAheadLog(docs_path + ".wal")
+        if not os.path.exists(docs_path) and not catalog_wal.size():
+            return
+        documents: Dict[str, Dict[str, Any]] = {}
+        checkpoint_lsn = 0
+        if os.path.exists(docs_path):
             try:
-                # Load existing FAISS index
-                self.vectorstore = FAISS.load_local(
-                    index_path, 
-                    self.embeddings
-                )
-                # Load documents metadata
                 with open(docs_path, 'rb') as f:
-                    self.documents = pickle.load(f)
-                print(f"Loaded existing FAISS index with {len(self.documents)} documents")
+                    state = pickle.load(f)
+                if isinstance(state, list):
+                    # Written before the catalog had a WAL
+                    state = {"documents": state, "lsn": 0}
+                documents = {doc["document_id"]: doc for doc in state["documents"]}
+                checkpoint_lsn = state["lsn"]
             except Exception as e:
-                print(f"Error loading existing index: {e}")
-                self.create_new_vectorstore()
-        else:
-            self.create_new_vectorstore()
-    
-    def create_new_vectorstore(self):
-        """Create a new FAISS vector store"""
-        # Create directory if it doesn't exist
-        os.makedirs(self.persist_directory, exist_ok=True)
+                print(f"Error loading document metadata: {e}")
+                return
+        for lsn, record in catalog_wal.replay(after_lsn=checkpoint_lsn):
+            if record["op"] == "add":
+                documents[record["document"]["document_id"]] = record["document"]
+            elif record["op"] == "delete":
+                documents.pop(record["document_id"], None)
         
-        # Initialize with empty documents
-        self.vectorstore = FAISS.from_texts(
-            texts=["Initial document"],
-            embedding=self.embeddings
+        self.metadata.add_documents(
+            (doc["document_id"], self._shard_key(doc["metadata"]), doc["metadata"], doc.get("chunk_count", 0))
+            for doc in documents.values()
         )
-        self.documents = []
-        print("Created new FAISS vector store")
+        catalog_wal.close()
+        for path in (docs_path, catalog_wal.path):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Migrated {len(documents)} documents into the metadata store")
+    
+    def _require_writer(self):
+        if self.read_only:
+            raise RuntimeError("The vector store is read-only in this worker; the writer process applies changes")
+    
+    def _publish(self, uids: Iterable[str]):
+        """With shared_index on, queue written shards for the next publish pass
+        
+        Writes landing between two passes share one snapshot per shard, so a
+        bulk upload doesn't rewrite a shard once per document.
+        """
+        if faiss_config.shared_index:
+            with self._unpublished_lock:
+                self._unpublished.update(uids)
+    
+    def publish_pending(self):
+        """Snapshot every shard written since the last pass"""
+        with self._unpublished_lock:
+            uids, self._unpublished = self._unpublished, set()
+        try:
+            self.publish(uids)
+        except BaseException:
+            with self._unpublished_lock:
+                self._unpublished.update(uids)
+            raise
+    
+    async def run_publishing(self, interval: float = None):
+        """Background task that makes writes visible to reader processes (shared_index only)"""
+        if not faiss_config.shared_index:
+            return
+        if interval is None:
+            interval = faiss_config.publish_interval_seconds
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.publish_pending)
+            except Exception as e:
+                print(f"Error publishing vector store snapshots: {e}")
+    
+    def publish(self, uids: Iterable[str]):
+        """Snapshot the given shards (document metadata is shared through SQLite already)"""
+        for uid in set(uids):
+            shard = self.shards.get(uid)
+            if shard is not None:
+                shard.checkpoint()
+    
+    def migrate_legacy_index(self):
+        """Split a pre-sharding global index into per-user shards (one-off)"""
+        index_path = os.path.join(self.persist_directory, faiss_config.index_name)
+        if not os.path.exists(index_path) or os.path.isdir(self.shards.root):
+            return
+        try:
+            from langchain_community.vectorstores import FAISS
+            legacy = FAISS.load_local(index_path, self.embeddings)
+        except Exception as e:
+            print(f"Error loading legacy index for migration: {e}")
+            return
+        
+        grouped: Dict[str, Tuple[List[str], List[List[float]], List[Dict[str, Any]]]] = {}
+        for position, docstore_id in legacy.index_to_docstore_id.items():
+            doc = legacy.docstore.search(docstore_id)
+            uid = getattr(doc, "metadata", {}).get("uid")
+            if not uid:
+                # Skips the "Initial document" placeholder and untagged chunks
+                continue
+            texts, vectors, metadatas = grouped.setdefault(uid, ([], [], []))
+            texts.append(doc.page_content)
+            vectors.append(legacy.index.reconstruct(position).tolist())
+            metadatas.append(doc.metadata)
+        
+        for uid, (texts, vectors, metadatas) in grouped.items():
+            shard = self.shards.get(uid, create=True)
+            shard.add_embeddings(texts, vectors, metadatas)
+            shard.checkpoint()
+        os.makedirs(self.shards.root, exist_ok=True)
+        print(f"Migrated legacy FAISS index into {len(grouped)} user shards")
     
     def save_vectorstore(self):
-        """Save the FAISS index and documents metadata"""
-        if self.vectorstore:
-            index_path = os.path.join(self.persist_directory, faiss_config.index_name)
-            docs_path = os.path.join(self.persist_directory, faiss_config.documents_file)
-            
-            # Save FAISS index
-            self.vectorstore.save_local(index_path)
-            
-            # Save documents metadata
-            with open(docs_path, 'wb') as f:
-                pickle.dump(self.documents, f)
+        """Checkpoint every loaded shard"""
+        if not self.loaded or self.read_only:
+            return
+        for shard in self.shards.loaded():
+            shard.checkpoint()
+    
+    def _shard_key(self, metadata: Dict[str, Any]) -> str:
+        """Shard a chunk belongs to; chunks without an owner share one shard"""
+        return metadata.get("uid") or "_global"
     
     async def add_document(self, document_id: str, content: str, metadata: Dict[str, Any]):
-        """Add a single document to the vector store"""
-        # Split content into chunks
-        chunks = self.text_splitter.split_text(content)
-        
-        # Prepare metadata for each chunk
-        chunk_metadatas = []
-        for i, chunk in enumerate(chunks):
-            chunk_metadata = metadata.copy()
-            chunk_metadata["chunk_id"] = i
-            chunk_metadata["document_id"] = document_id
-            chunk_metadatas.append(chunk_metadata)
-        
-        # Add to vector store
-        self.vectorstore.add_texts(texts=chunks, metadatas=chunk_metadatas)
-        
-        # Store document metadata
-        self.documents.append({
-            "document_id": document_id,
-            "metadata": metadata,
-            "chunk_count": len(chunks)
-        })
-        
-        # Save the updated vector store
-        self.save_vectorstore()
+        """Add a single document to the owner's shard
+        
+        Only WAL records are written here; returns once they are durable.
+        """
+        async def single_page():
+            yield content
+        await self.add_document_pages(document_id, single_page(), metadata)
+    
+    async def add_document_pages(
+        self,
+        document_id: str,
+        pages: AsyncIterator[str],
+        metadata: Dict[str, Any],
+        progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> str:
+        """Add a document whose text arrives page by page, returning the full text
+        
+        Each page is chunked and embedded as soon as it arrives, so extraction of
+        later pages overlaps with embedding of earlier ones. progress, if given,
+        is awaited with (pages, chunks) processed so far after every page.
+        """
+        self.ensure_loaded()
+        self._require_writer()
+        uid = self._shard_key(metadata)
+        # A retried ingest replaces chunks left by an interrupted earlier attempt
+        shard = await self.shards.get_async(uid)
+        if shard is not None and document_id in shard.document_ids:
+            shard.delete_document(document_id)
+        texts = []
+        commits = []
+        chunk_count = 0
+        try:
+            async for page in pages:
+                texts.append(page)
+                # Split content into chunks
+                chunks = self.text_splitter.split_text(page)
+                if not chunks:
+                    if progress is not None:
+                        await progress(len(texts), chunk_count)
+                    continue
+                
+                # Prepare metadata for each chunk
+                chunk_metadatas = []
+                for i, chunk in enumerate(chunks):
+                    chunk_metadata = metadata.copy()
+                    chunk_metadata["chunk_id"] = chunk_count + i
+                    chunk_metadata["document_id"] = document_id
+                    chunk_metadatas.append(chunk_metadata)
+                chunk_count += len(chunks)
+                
+                # Inference runs in the executor's worker pool, batched with other requests
+                vectors = await embedding_executor.embed_texts(chunks)
+                shard = await self.shards.get_async(uid, create=True)
+                commits.append(shard.add_embeddings(chunks, vectors, chunk_metadatas))
+                self.shards.touch(uid)
+                if progress is not None:
+                    await progress(len(texts), chunk_count)
+        except BaseException:
+            # Don't leave part of a failed document searchable
+            if commits:
+                # The shard that took the commits; no lookup (or load) needed here
+                shard.delete_document(document_id)
+            raise
+        
+        await asyncio.gather(*(asyncio.wrap_future(commit) for commit in commits if commit))
+        # The document row is written once its chunks are durable
+        self.metadata.add_document(document_id, uid, metadata, chunk_count)
+        self._publish([uid])
+        return "\n\n".join(texts)
+    
+    async def add_document_batch(
+        self, documents: List[Tuple[str, List[str], Dict[str, Any]]]
+    ) -> Dict[str, int]:
+        """Add several documents with one embedding pass and one WAL record per shard
+        
+        documents are (document_id, pages, metadata) tuples. Returns the number
+        of chunks added for each document ID.
+        """
+        self.ensure_loaded()
+        self._require_writer()
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        chunk_counts: Dict[str, int] = {}
+        for document_id, pages, metadata in documents:
+            # A retried ingest replaces chunks left by an interrupted earlier attempt
+            shard = await self.shards.get_async(self._shard_key(metadata))
+            if shard is not None and document_id in shard.document_ids:
+                shard.delete_document(document_id)
+            
+            count = 0
+            for page in pages:
+                for chunk in self.text_splitter.split_text(page):
+                    chunk_metadata = metadata.copy()
+                    chunk_metadata["chunk_id"] = count
+                    chunk_metadata["document_id"] = document_id
+                    texts.append(chunk)
+                    metadatas.append(chunk_metadata)
+                    count += 1
+            chunk_counts[document_id] = count
+        
+        # Every chunk in the batch goes to the model together
+        vectors = await embedding_executor.embed_texts(texts)
+        
+        grouped: Dict[str, Tuple[List[str], List[List[float]], List[Dict[str, Any]]]] = {}
+        for text, vector, metadata in zip(texts, vectors, metadatas):
+            shard_texts, shard_vectors, shard_metadatas = grouped.setdefault(self._shard_key(metadata), ([], [], []))
+            shard_texts.append(text)
+            shard_vectors.append(vector)
+            shard_metadatas.append(metadata)
+        
+        commits = []
+        for uid, (shard_texts, shard_vectors, shard_metadatas) in grouped.items():
+            shard = await self.shards.get_async(uid, create=True)
+            commits.append(shard.add_embeddings(shard_texts, shard_vectors, shard_metadatas))
+            self.shards.touch(uid)
+        
+        # The group committer folds all of these into a single fsync per log
+        await asyncio.gather(*(asyncio.wrap_future(commit) for commit in commits if commit))
+        self.metadata.add_documents(
+            (document_id, self._shard_key(metadata), metadata, chunk_counts[document_id])
+            for document_id, pages, metadata in documents
+        )
+        self._publish(grouped.keys())
+        return chunk_counts
     
     async def delete_document(self, document_id: str):
         """Delete all chunks for a specific document"""
-        # Get all documents with the specific document_id
-        # Note: FAISS doesn't support direct deletion, so we'll rebuild the index
-        # This is a limitation of FAISS, but it's still more reliable than ChromaDB on Windows
+        self.ensure_loaded()
+        self._require_writer()
+        # Only the owning user's shard has to be touched
+        owners = self.metadata.document_owners(document_id)
+        self.metadata.remove_document(document_id)
         
-        # Remove from documents list
-        self.documents = [doc for doc in self.documents if doc["document_id"] != document_id]
+        # Tombstone exactly this document's vector IDs; compaction reclaims them later
+        commits = []
+        for uid in owners:
+            shard = await self.shards.get_async(uid)
+            if shard is not None:
+                commits.append(shard.delete_document(document_id))
         
-        # Rebuild the index without the deleted document
-        self.rebuild_index()
+        await asyncio.gather(*(asyncio.wrap_future(commit) for commit in commits if commit))
+        self._publish(owners)
     
-    def rebuild_index(self):
-        """Rebuild the FAISS index from remaining documents"""
-        # This is a simplified approach - in production you might want to store
-        # the original texts separately for rebuilding
-        print("Rebuilding FAISS index...")
-        self.create_new_vectorstore()
+    def compact(self) -> int:
+        """Remove tombstoned vectors from every loaded shard and upgrade shards that outgrew a flat index"""
+        if not self.loaded or self.read_only:
+            return 0
+        reclaimed = 0
+        for shard in self.shards.loaded():
+            removed = shard.compact()
+            converted = shard.convert_index()
+            if removed or converted:
+                shard.checkpoint(force=True)
+                reclaimed += removed
+        return reclaimed
     
-    async def get_user_context(self, uid: str, max_chunks: int = None) -> str:
+    async def run_compaction(self, interval: int = None):
+        """Background task that periodically compacts loaded shards"""
+        if interval is None:
+            interval = faiss_config.compaction_interval_seconds
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                reclaimed = await asyncio.to_thread(self.compact)
+                if reclaimed:
+                    print(f"Compaction reclaimed {reclaimed} deleted vectors")
+            except Exception as e:
+                print(f"Error compacting vector store: {e}")
+    
+    async def run_checkpoints(self, interval: int = None):
+        """Background task that folds WAL records into snapshots"""
+        if interval is None:
+            interval = faiss_config.checkpoint_interval_seconds
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.save_vectorstore)
+            except Exception as e:
+                print(f"Error checkpointing vector store: {e}")
+    
+    def corpus_version(self, uid: str) -> int:
+        """Version of a user's chunks; increases on every add or delete for that user
+        
+        Unlike the shard's LSN it survives the shard being dropped or cleared,
+        and it needs no shard to be loaded.
+        """
+        self.ensure_loaded()
+        return self.metadata.corpus_version(uid)
+    
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a retrieval query, truncated to the configured length"""
+        return await embedding_executor.embed_query(query[:faiss_config.max_query_chars])
+    
+    async def get_context_segments(
+        self,
+        uid: str,
+        max_chunks: int = None,
+        query: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> Optional[List[Document]]:
+        """Pick the chunks for a user's context, merged into segments in relevance order
+        
+        When a query (or its pre-computed embedding) is given, the user's chunks
+        are ranked by similarity to it; otherwise a generic query is used. With
+        search_mode "hybrid" and a query text, BM25 matches on its exact terms
+        are fused into the ranking. Up to max_chunks of the candidates are then
+        picked with maximal marginal relevance, and neighbouring chunks of one
+        document are merged. Returns None if retrieval failed.
+        """
         if max_chunks is None:
             max_chunks = faiss_config.max_context_chunks
-        """Get user's document context for content generation"""
         try:
-            # Search for user's documents
-            # Since FAISS doesn't support filtering, we'll search and filter results
-            dummy_query = "user context"  # We'll filter results by metadata
-            results = self.vectorstore.similarity_search_with_score(
-                dummy_query,
-                k=max_chunks * 2  # Get more results to filter
-            )
+            self.ensure_loaded()
+            # Only the user's own shard is searched, so no post-filtering is needed
+            shard = await self.shards.get_async(uid)
+            if shard is None or shard.size == 0:
+                return []
             
-            # Filter results by user ID
-            user_results = []
-            for doc, score in results:
-                if hasattr(doc, 'metadata') and doc.metadata.get('uid') == uid:
-                    user_results.append((doc, score))
-            
-            if not user_results:
-                return "No user documents found."
-            
-            # Take the top results
-            user_results = user_results[:max_chunks]
-            
-            # Combine all chunks
-            context_parts = []
-            for doc, score in user_results:
-                doc_type = doc.metadata.get("document_type", "unknown")
-                context_parts.append(f"Document Type: {doc_type}")
-                context_parts.append(f"Content: {doc.page_content}")
-                context_parts.append("---")
+            if query_embedding is None:
+                query_embedding = await self.embed_query(query or "user context")
+            fetch_k = max_chunks * faiss_config.context_candidates
+            if query and faiss_config.search_mode == "hybrid":
+                results, vectors = shard.search_hybrid(
+                    query[:faiss_config.max_query_chars], query_embedding, k=fetch_k, return_vectors=True
+                )
+                scores = [score for doc, score in results]
+            else:
+                results, vectors = shard.search_by_vector(query_embedding, k=fetch_k, return_vectors=True)
+                scores = [-distance for doc, distance in results]
+            if not results:
+                return []
             
-            return "\n".join(context_parts)
+            if vectors is None:
+                vectors = self._cached_vectors([doc.page_content for doc, score in results])
+            if vectors is None:
+                # Results already come in relevance order
+                picked = range(min(max_chunks, len(results)))
+            else:
+                picked = mmr(scores, vectors, max_chunks, faiss_config.context_mmr_lambda)
+            return merge_adjacent([results[position][0] for position in picked], faiss_config.chunk_overlap)
             
         except Exception as e:
             print(f"Error getting user context: {e}")
-            return "Error retrieving user context."
+            return None
+    
+    def _cached_vectors(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Chunk vectors from the embedding cache (no model pass), or None unless all are cached"""
+        cache = embedding_service.cache
+        vectors = cache.get_many(texts) if cache is not None else [None]
+        if any(vector is None for vector in vectors):
+            return None
+        return np.asarray(vectors, dtype=np.float32)
+    
+    async def get_user_context(
+        self,
+        uid: str,
+        max_chunks: int = None,
+        query: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        token_budget: Optional[int] = None
+    ) -> str:
+        """Get user's document context for content generation
+        
+        Segments are picked by get_context_segments and packed, most relevant
+        first, into token_budget tokens (no limit if None).
+        """
+        segments = await self.get_context_segments(uid, max_chunks, query, query_embedding)
+        return pack_context(segments, token_budget)
     
     def add_documents(self, documents: List[str], metadata: List[Dict[str, Any]] = None):
         """Add documents to the vector store"""
+        self.ensure_loaded()
+        self._require_writer()
         if metadata is None:
             metadata = [{"source": f"doc_{i}"} for i in range(len(documents))]
         
-        # Split documents into chunks
-        docs = []
+        # Split documents into chunks, grouped by owning shard
+        grouped: Dict[str, Tuple[List[str], List[Dict[str, Any]]]] = {}
         for doc, meta in zip(documents, metadata):
-            chunks = self.text_splitter.split_text(doc)
-            for chunk in chunks:
-                docs.append({"text": chunk, "metadata": meta})
-        
-        # Add to vector store
-        texts = [doc["text"] for doc in docs]
-        metadatas = [doc["metadata"] for doc in docs]
+            texts, metadatas = grouped.setdefault(self._shard_key(meta), ([], []))
+            for chunk in self.text_splitter.split_text(doc):
+                texts.append(chunk)
+                metadatas.append(meta)
         
-        self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
-        
-        # Save the updated vector store
-        self.save_vectorstore()
+        # Add to each shard and wait for the WAL records to be durable
+        commits = []
+        for uid, (texts, metadatas) in grouped.items():
+            if not texts:
+                continue
+            shard = self.shards.get(uid, create=True)
+            commits.append(shard.add_embeddings(texts, embedding_service.embed_texts(texts), metadatas))
+            self.shards.touch(uid)
+        for commit in commits:
+            commit.result()
+        if faiss_config.shared_index:
+            self.publish(grouped.keys())
     
     def search(self, query: str, k: int = None, filter_dict: Dict[str, Any] = None):
-        if k is None:
-            k = faiss_config.default_search_k
         """Search for similar documents"""
-        results = self.vectorstore.similarity_search(
-            query=query,
-            k=k
-        )
-        
-        # Apply filtering if specified
-        if filter_dict:
-            filtered_results = []
-            for doc in results:
-                if hasattr(doc, 'metadata'):
-                    matches = all(
-                        doc.metadata.get(key) == value 
-                        for key, value in filter_dict.items()
-                    )
-                    if matches:
-                        filtered_results.append(doc)
-            return filtered_results
-        
-        return results
+        return [doc for doc, score in self.search_with_score(query, k, filter_dict)]
     
     def search_with_score(self, query: str, k: int = None, filter_dict: Dict[str, Any] = None):
         if k is None:
             k = faiss_config.default_search_k
         """Search for similar documents with similarity scores"""
-        results = self.vectorstore.similarity_search_with_score(
-            query=query,
-            k=k
-        )
+        filter_dict = filter_dict or {}
+        self.ensure_loaded()
         
-        # Apply filtering if specified
-        if filter_dict:
-            filtered_results = []
-            for doc, score in results:
-                if hasattr(doc, 'metadata'):
-                    matches = all(
-                        doc.metadata.get(key) == value 
-                        for key, value in filter_dict.items()
-                    )
-                    if matches:
-                        filtered_results.append((doc, score))
-            return filtered_results
-        
-        return results
+        # A uid filter routes to a single shard; otherwise every shard is scanned
+        if "uid" in filter_dict:
+            uids = [filter_dict["uid"]]
+        else:
+            uids = list(self.shards.uids())
+        
+        query_embedding = self.embeddings.embed_query(query)
+        results = []
+        for uid in uids:
+            shard = self.shards.get(uid)
+            if shard is None:
+                continue
+            # Over-fetch when filtering so that k matches survive
+            fetch_k = k * 2 if len(filter_dict) > ("uid" in filter_dict) else k
+            for doc, score in shard.search_by_vector(query_embedding, fetch_k):
+                matches = all(
+                    doc.metadata.get(key) == value 
+                    for key, value in filter_dict.items()
+                )
+                if matches:
+                    results.append((doc, score))
+        
+        results.sort(key=lambda item: item[1])
+        return results[:k]
     
     def get_collection_stats(self):
         """Get statistics about the collection"""
+        self.ensure_loaded()
+        documents = self.metadata.document_count()
         return {
-            "count": len(self.documents),
+            "count": documents,
             "name": "FAISS Vector Store",
-            "documents": len(self.documents)
+            "documents": documents,
+            "loaded_shard_bytes": self.shards.loaded_bytes(),
+            "index_type": faiss_config.index_type,
+            "indexes": self.shards.index_stats()
         }
     
+    def get_user_stats(self, uid: str) -> Dict[str, Any]:
+        """Document and chunk counts for one user, by document type"""
+        self.ensure_loaded()
+        return self.metadata.user_stats(uid)
+    
     def clear_collection(self):
         """Clear all documents from the collection"""
-        self.create_new_vectorstore()
-        self.save_vectorstore()
+        self.ensure_loaded()
+        self._require_writer()
+        self.shards.clear()
+        self.metadata.clear()
 
 # Global vector store instance
-vectorstore = VectorStore() 
\ No newline at end of file
+vectorstore = VectorStore() 
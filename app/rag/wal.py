@@ -0,0 +1,165 @@
+"""
+Write-Ahead Log
+
+Vector store mutations are appended to per-shard logs instead of rewriting the
+whole index on every upload. Each record is framed as
+``<payload length><crc32><lsn><pickled payload>`` so a torn tail left by a crash
+is detected and discarded on replay. A single ``GroupCommitter`` thread batches
+records from concurrent writers and fsyncs each touched log once per batch.
+"""
+
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Tuple
+from .config import faiss_config
+
+HEADER = struct.Struct("<IIQ")
+
+
+class WriteAheadLog:
+    """Append-only log of pickled records tagged with log sequence numbers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def write(self, lsn: int, record: Dict[str, Any]):
+        """Append a record (not yet durable until sync)"""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._open().write(HEADER.pack(len(payload), zlib.crc32(payload), lsn) + payload)
+
+    def sync(self):
+        """Flush and fsync everything written so far"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def replay(self, after_lsn: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (lsn, record) pairs newer than after_lsn, dropping a torn tail"""
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        records: List[Tuple[int, Dict[str, Any]]] = []
+        with open(self.path, 'rb') as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    break
+                length, crc, lsn = HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                valid_bytes = f.tell()
+                if lsn > after_lsn:
+                    records.append((lsn, pickle.loads(payload)))
+
+        if valid_bytes < os.path.getsize(self.path):
+            print(f"Discarding torn tail of write-ahead log {self.path}")
+            with self._lock:
+                self._close()
+                with open(self.path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+        yield from records
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def truncate(self):
+        """Discard all records; called once they are covered by a checkpoint"""
+        with self._lock:
+            self._close()
+            if os.path.exists(self.path):
+                with open(self.path, 'wb') as f:
+                    os.fsync(f.fileno())
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+class GroupCommitter:
+    """Batches WAL appends from concurrent writers into one fsync per log"""
+
+    def __init__(self, window_seconds: float = None, max_batch: int = 256):
+        if window_seconds is None:
+            window_seconds = faiss_config.wal_commit_window_ms / 1000
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[WriteAheadLog, int, Dict[str, Any], Future]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, wal: WriteAheadLog, lsn: int, record: Dict[str, Any]) -> Future:
+        """Queue a record; the future resolves once it is durable"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((wal, lsn, record, future))
+        return future
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="wal-group-commit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        touched: Dict[int, WriteAheadLog] = {}
+        failed: Dict[int, Exception] = {}
+        for wal, lsn, record, future in batch:
+            try:
+                wal.write(lsn, record)
+                touched[id(wal)] = wal
+            except Exception as e:
+                failed[id(future)] = e
+        for key, wal in touched.items():
+            try:
+                wal.sync()
+            except Exception as e:
+                failed[key] = e
+        for wal, lsn, record, future in batch:
+            error = failed.get(id(future)) or failed.get(id(wal))
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(lsn)
+
+
+# Global group committer instance
+group_committer = GroupCommitter()
@@ -1,15 +1,32 @@
-from typing import Optional
+import asyncio
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Union
 from ..models import ContentType, ContentGenerationRequest, ContentGenerationResponse
 from ..config import settings
-from ..rag import VectorStore
-import google.generativeai as genai
+from ..rag import VectorStore, vectorstore, faiss_config
+from ..rag.context_packer import pack_context
+from .llm_client import GeminiClient, LLMResponse, llm_client
+from .generation_cache import GenerationCache, cache_key
+from .single_flight import SingleFlight
+
+# LinkedIn connection notes are capped at 300 characters
+LINKEDIN_MAX_CHARS = 300
 
 class ContentService:
-    def __init__(self):
-        self.vector_store = VectorStore()
-        # Configure Google Gemini
-        if settings.google_api_key:
-            genai.configure(api_key=settings.google_api_key)
+    def __init__(self, vector_store: Optional[VectorStore] = None, llm: Optional[GeminiClient] = None):
+        # Shares the process-wide store so new uploads are retrievable immediately
+        self.vector_store = vector_store or vectorstore
+        # Pooled, non-blocking Gemini client
+        self.llm = llm or llm_client
+        # Results keyed by the user's corpus version, so uploads/deletes invalidate them
+        self.cache = GenerationCache()
+        self.single_flight = SingleFlight()
+    
+    def _build_retrieval_query(self, request: ContentGenerationRequest) -> str:
+        """Build the text used to rank the user's chunks against this request"""
+        # Role and company go first so they survive query truncation
+        parts = [request.target_role, request.target_company, request.job_description]
+        return "\n".join(part.strip() for part in parts if part and part.strip())
     
     def _get_content_prompt(self, content_type: ContentType, user_context: str, request: ContentGenerationRequest) -> str:
         """Generate appropriate prompt based on content type"""
@@ -37,27 +54,20 @@ class ContentService:
 \n{base_context}\nThe LinkedIn message should be brief (max 300 characters), professional, and use a {request.tone} tone.\nLinkedIn Message:"""
         return f"""Generate professional content based on this information:\n{base_context}\nContent:"""
     
-    async def _call_gemini_api(self, prompt: str) -> str:
+    async def _call_gemini_api(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
         """Call the Google Gemini API to generate content from a prompt."""
         try:
             # Check if API key is configured
-            if not settings.google_api_key:
+            if not self.llm.configured:
                 # Fallback to basic content generation
-                return self._generate_fallback_content(prompt)
+                return LLMResponse(text=self._generate_fallback_content(prompt), fallback=True)
             
-            # Use Gemini 1.5 Pro - the most advanced model
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            response = model.generate_content(prompt)
-            
-            if response.text:
-                return response.text
-            else:
-                raise Exception("No content generated from Gemini API")
+            return await self.llm.generate(prompt, timeout=timeout)
                 
         except Exception as e:
-            # Fallback if API fails
+            # Fallback if API fails or times out
             print(f"API Error: {str(e)}. Using fallback content generation.")
-            return self._generate_fallback_content(prompt)
+            return LLMResponse(text=self._generate_fallback_content(prompt), fallback=True)
     
     def _generate_fallback_content(self, prompt: str) -> str:
         """Generate basic fallback content when API is not available."""
@@ -98,26 +108,204 @@ Best regards,
         else:
             return "Content generation is currently using fallback mode. Please configure your Google API key for full functionality."
     
+    async def _retrieve_context(self, uid: str, request: ContentGenerationRequest):
+        """Retrieve the user's context segments, ranked against the job description"""
+        query = self._build_retrieval_query(request)
+        query_embedding = await self.vector_store.embed_query(query)
+        return await self.vector_store.get_context_segments(
+            uid,
+            max_chunks=faiss_config.query_context_chunks,
+            query=query,
+            query_embedding=query_embedding
+        )
+    
+    def _pack_context(self, content_type: ContentType, segments) -> str:
+        """Pack context segments into the content type's token budget"""
+        return pack_context(segments, faiss_config.context_token_budgets.get(content_type.value))
+    
+    async def _build_prompt(self, uid: str, request: ContentGenerationRequest) -> str:
+        """Retrieve the user's context and build the prompt for this request"""
+        segments = await self._retrieve_context(uid, request)
+        user_context = self._pack_context(request.content_type, segments)
+        return self._get_content_prompt(request.content_type, user_context, request)
+    
+    def _build_response(
+        self,
+        content_type: ContentType,
+        prompt: str,
+        generated_content: str,
+        total_tokens: Optional[int] = None
+    ) -> ContentGenerationResponse:
+        return ContentGenerationResponse(
+            content_type=content_type,
+            generated_content=generated_content,
+            prompt_used=prompt,
+            tokens_used=total_tokens or len(prompt + generated_content) // 4
+        )
+    
+    def _cache_key(self, uid: str, content_type: ContentType, request: ContentGenerationRequest):
+        return cache_key(uid, self.vector_store.corpus_version(uid), content_type, request)
+    
+    def _cached(self, key, request: ContentGenerationRequest) -> Optional[ContentGenerationResponse]:
+        """Cached result for key unless the caller asked to regenerate"""
+        if request.regenerate:
+            return None
+        return self.cache.get(key)
+    
     async def generate_content(self, uid: str, request: ContentGenerationRequest) -> ContentGenerationResponse:
         """Generate personalized content using RAG context and Gemini API"""
         try:
-            # Get user's RAG context
-            user_context = await self.vector_store.get_user_context(uid)
-            # Generate prompt
-            prompt = self._get_content_prompt(request.content_type, user_context, request)
-            # Call Gemini API
-            generated_content = await self._call_gemini_api(prompt)
-            # Enforce LinkedIn message length
-            if request.content_type == ContentType.LINKEDIN_MESSAGE:
-                generated_content = generated_content[:300]
-            return ContentGenerationResponse(
-                content_type=request.content_type,
-                generated_content=generated_content,
-                prompt_used=prompt,
-                tokens_used=len(prompt + generated_content) // 4
+            key = self._cache_key(uid, request.content_type, request)
+            cached = self._cached(key, request)
+            if cached is not None:
+                return cached
+            # Identical concurrent requests share one retrieval + LLM call
+            return await self.single_flight.do(
+                ("generate", key), partial(self._generate_uncached, uid, request, key)
             )
         except Exception as e:
             raise Exception(f"Error generating content: {str(e)}")
+    
+    async def _generate_uncached(self, uid: str, request: ContentGenerationRequest, key) -> ContentGenerationResponse:
+        prompt = await self._build_prompt(uid, request)
+        # Call Gemini API
+        llm_response = await self._call_gemini_api(prompt)
+        generated_content = llm_response.text
+        # Enforce LinkedIn message length
+        if request.content_type == ContentType.LINKEDIN_MESSAGE:
+            generated_content = generated_content[:LINKEDIN_MAX_CHARS]
+        response = self._build_response(request.content_type, prompt, generated_content, llm_response.total_tokens)
+        # Canned fallback content is never cached
+        if not llm_response.fallback:
+            self.cache.put(key, response)
+        return response
+    
+    async def generate_content_stream(
+        self, uid: str, request: ContentGenerationRequest
+    ) -> AsyncIterator[Union[str, ContentGenerationResponse]]:
+        """Yield generated text as it arrives, then the full response as the last item"""
+        key = self._cache_key(uid, request.content_type, request)
+        cached = self._cached(key, request)
+        if cached is not None:
+            yield cached.generated_content
+            yield cached
+            return
+        
+        # Identical concurrent streams share one generation; late joiners replay it
+        async for item in self.single_flight.stream(
+            ("stream", key), partial(self._stream_uncached, uid, request, key)
+        ):
+            yield item
+    
+    async def _stream_uncached(
+        self, uid: str, request: ContentGenerationRequest, key
+    ) -> AsyncIterator[Union[str, ContentGenerationResponse]]:
+        prompt = await self._build_prompt(uid, request)
+        limit = LINKEDIN_MAX_CHARS if request.content_type == ContentType.LINKEDIN_MESSAGE else None
+        parts: List[str] = []
+        generated_chars = 0
+        total_tokens = None
+        
+        if self.llm.configured:
+            stream = self.llm.stream(prompt)
+            try:
+                async for delta in stream:
+                    total_tokens = delta.total_tokens or total_tokens
+                    text = delta.text
+                    if limit is not None:
+                        text = text[:limit - generated_chars]
+                    if text:
+                        parts.append(text)
+                        generated_chars += len(text)
+                        yield text
+                    if limit is not None and generated_chars >= limit:
+                        break
+            except Exception as e:
+                # Once text has been sent we can't switch to the fallback
+                if parts:
+                    raise Exception(f"Error generating content: {str(e)}")
+                print(f"API Error: {str(e)}. Using fallback content generation.")
+            finally:
+                await stream.aclose()
+        
+        used_fallback = not parts
+        if used_fallback:
+            fallback = self._generate_fallback_content(prompt)
+            if limit is not None:
+                fallback = fallback[:limit]
+            parts.append(fallback)
+            yield fallback
+        
+        response = self._build_response(request.content_type, prompt, "".join(parts), total_tokens)
+        if not used_fallback:
+            self.cache.put(key, response)
+        yield response
+    
+    async def _generate_for_type(
+        self, content_type: ContentType, prompt: str, deadline: float, key
+    ) -> ContentGenerationResponse:
+        """Generate one content type, falling back if the shared deadline passes"""
+        remaining = max(deadline - asyncio.get_running_loop().time(), 0.001)
+        llm_response = await self._call_gemini_api(prompt, timeout=remaining)
+        generated_content = llm_response.text
+        if content_type == ContentType.LINKEDIN_MESSAGE:
+            generated_content = generated_content[:LINKEDIN_MAX_CHARS]
+        response = self._build_response(content_type, prompt, generated_content, llm_response.total_tokens)
+        if not llm_response.fallback:
+            self.cache.put(key, response)
+        return response
+    
+    async def iter_multiple_content(
+        self, uid: str, request: ContentGenerationRequest
+    ) -> AsyncIterator[ContentGenerationResponse]:
+        """Generate every content type concurrently, yielding each as it completes
+        
+        User context is retrieved once and packed per content type; the LLM calls
+        share one deadline so wall-clock time tracks the slowest generation.
+        """
+        # Cached results are returned straight away; only misses hit the LLM
+        misses = []
+        for content_type in ContentType:
+            key = self._cache_key(uid, content_type, request)
+            cached = self._cached(key, request)
+            if cached is not None:
+                yield cached
+            else:
+                misses.append((content_type, key))
+        if not misses:
+            return
+        
+        # Retrieved once; each content type packs it into its own token budget
+        segments = await self._retrieve_context(uid, request)
+        deadline = asyncio.get_running_loop().time() + settings.llm_timeout_seconds
+        tasks = [
+            asyncio.ensure_future(self.single_flight.do(("generate", key), partial(
+                self._generate_for_type,
+                content_type,
+                self._get_content_prompt(content_type, self._pack_context(content_type, segments), request),
+                deadline,
+                key
+            )))
+            for content_type, key in misses
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def generate_multiple_content(
+        self, uid: str, request: ContentGenerationRequest
+    ) -> Dict[str, ContentGenerationResponse]:
+        """Generate all content types, keyed by content type"""
+        try:
+            results = {}
+            async for response in self.iter_multiple_content(uid, request):
+                results[response.content_type.value] = response
+            return results
+        except Exception as e:
+            raise Exception(f"Error generating content: {str(e)}")
 
 # Global content service instance
 content_service = ContentService() 
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Document Extraction Service
+
+Runs the extractors in ``app.extractors`` in a process pool so CPU-heavy
+parsing (PDFs in particular) never stalls the API worker. Pages are extracted
+in small batches and yielded in order as soon as each batch is ready, with a
+bounded number of batches in flight per file. Every file has an overall
+timeout; a file that exceeds it has its worker processes terminated. The pool
+is then replaced once, and other files' jobs that were running on it are
+resubmitted to the new pool rather than failed. After a worker crash, each job
+it took down is retried in a process of its own.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Set, Tuple
+from ..config import settings
+from ..extractors import ExtractionError, count_pages, extract_pages, get_extractor
+
+
+class ExtractionService:
+    """Process-pool front end for the document extractors"""
+
+    def __init__(self, workers: int = None, timeout: float = None, pages_per_task: int = None):
+        self.workers = workers or settings.extraction_workers
+        self.timeout = timeout or settings.extraction_timeout_seconds
+        self.pages_per_task = pages_per_task or settings.extraction_pages_per_task
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Bumped whenever the pool is replaced, so one failure replaces it only once
+        self._generation = 0
+        # Generations killed because some file timed out; their other jobs did nothing wrong
+        self._killed_generations: Set[int] = set()
+
+    def supports(self, filename: str) -> bool:
+        return get_extractor(filename) is not None
+
+    @staticmethod
+    def _new_pool(workers: int) -> ProcessPoolExecutor:
+        # Spawned rather than forked: the API process has threads running
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @staticmethod
+    def _kill(pool: ProcessPoolExecutor):
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        # Jobs still queued on the pool fail with BrokenProcessPool
+        pool.shutdown(wait=False)
+
+    def _get_pool(self) -> Tuple[ProcessPoolExecutor, int]:
+        """Worker processes (started on first use) and their generation"""
+        if self._pool is None:
+            self._pool = self._new_pool(self.workers)
+        return self._pool, self._generation
+
+    def _replace_pool(self, generation: int, killed: bool = False):
+        """Kill the workers of one pool generation and start fresh on next use
+        
+        Only the first caller for a generation replaces it; jobs failing with it
+        afterwards find a newer generation and just run again.
+        """
+        if generation != self._generation:
+            return
+        pool, self._pool = self._pool, None
+        self._generation += 1
+        if killed:
+            self._killed_generations.add(generation)
+        if pool is not None:
+            self._kill(pool)
+
+    async def _run(self, deadline: float, fn, *args):
+        """Run fn in a worker process by the deadline, resubmitting it if another job's failure took the pool down"""
+        loop = asyncio.get_running_loop()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            pool, generation = self._get_pool()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), remaining)
+            except asyncio.TimeoutError:
+                # Stuck on a pathological file; only killing the workers frees them
+                self._replace_pool(generation, killed=True)
+                raise
+            except BrokenProcessPool:
+                if generation in self._killed_generations:
+                    continue
+                # A worker crashed, maybe on this file. Each job it took down runs again
+                # in a process of its own, so a second crash only fails the file causing it.
+                self._replace_pool(generation)
+                return await self._run_isolated(deadline, fn, *args)
+
+    async def _run_isolated(self, deadline: float, fn, *args):
+        """Run fn in a single-use worker process that no other job shares"""
+        loop = asyncio.get_running_loop()
+        pool = self._new_pool(1)
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), max(0.0, deadline - loop.time()))
+        finally:
+            self._kill(pool)
+
+    async def extract(self, file_path: str, filename: str, timeout: float = None) -> AsyncIterator[str]:
+        """Yield the text of each page of the file, in order"""
+        extractor = get_extractor(filename)
+        if extractor is None:
+            raise ExtractionError(f"Unsupported file type: {filename}")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+
+        def submit(start: int, end: int) -> asyncio.Task:
+            return asyncio.ensure_future(self._run(deadline, extract_pages, extractor, file_path, start, end))
+
+        pending: List[asyncio.Task] = []
+        try:
+            page_count = await self._run(deadline, count_pages, extractor, file_path)
+            batches = [
+                (start, min(start + self.pages_per_task, page_count))
+                for start in range(0, page_count, self.pages_per_task)
+            ]
+            # Keep a few batches ahead so extraction overlaps with chunking/embedding
+            for start, end in batches[:self.workers]:
+                pending.append(submit(start, end))
+            next_batch = len(pending)
+
+            while pending:
+                pages = await pending.pop(0)
+                if next_batch < len(batches):
+                    pending.append(submit(*batches[next_batch]))
+                    next_batch += 1
+                for page in pages:
+                    if page.strip():
+                        yield page
+        except asyncio.TimeoutError:
+            raise ExtractionError(f"Timed out extracting text from {filename}")
+        except BrokenProcessPool as e:
+            raise ExtractionError(f"Extraction worker crashed on {filename}") from e
+        except ExtractionError:
+            raise
+        except Exception as e:
+            raise ExtractionError(f"Could not extract text from {filename}: {e}") from e
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+# Global extraction service instance
+extraction_service = ExtractionService()
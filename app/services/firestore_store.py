@@ -0,0 +1,178 @@
+"""
+Firestore Access Layer
+
+Async facade over the document database used by the services. The Firestore
+client library is synchronous, so every call runs on a small dedicated thread
+pool instead of blocking the event loop. Multi-document writes go through
+``WriteBatch`` commits.
+
+Set ``FIRESTORE_EMULATOR_HOST`` to point the real client at the Firestore
+emulator, or ``FIRESTORE_BACKEND=memory`` to use the in-process stand-in.
+"""
+
+import asyncio
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..config import settings
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_WRITES = 500
+
+
+class DocumentStore:
+    """Async interface shared by the Firestore and in-memory backends"""
+
+    def __init__(self, max_workers: int = None):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or settings.firestore_max_workers,
+            thread_name_prefix="firestore"
+        )
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, fn, *args)
+
+    async def get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch one document, or None if it does not exist"""
+        return await self._run(self._get, collection, doc_id)
+
+    async def where(self, collection: str, field: str, value: Any) -> List[Tuple[str, Dict[str, Any]]]:
+        """(id, data) pairs for documents whose field equals value"""
+        return await self._run(self._where, collection, field, value)
+
+    async def set(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool = False):
+        await self._run(self._set, collection, doc_id, data, merge)
+
+    async def update(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        await self._run(self._update, collection, doc_id, data)
+
+    async def delete(self, collection: str, doc_id: str):
+        await self._run(self._delete, collection, doc_id)
+
+    async def write_batch(
+        self,
+        sets: Iterable[Tuple[str, str, Dict[str, Any]]] = (),
+        deletes: Iterable[Tuple[str, str]] = ()
+    ):
+        """Apply (collection, id, data) sets and (collection, id) deletes in batched commits"""
+        writes = [("set", *write) for write in sets] + [("delete", *write) for write in deletes]
+        if not writes:
+            return
+        await self._run(self._write_batch, writes)
+
+    def close(self):
+        """Stop the worker threads once queued calls have finished"""
+        self.pool.shutdown(wait=True)
+
+
+class FirestoreStore(DocumentStore):
+    """DocumentStore backed by the Firebase Admin Firestore client"""
+
+    def __init__(self, client=None, max_workers: int = None):
+        super().__init__(max_workers)
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def db(self):
+        """Firestore client, created on first use"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from firebase_admin import firestore
+                    self._client = firestore.client()
+        return self._client
+
+    def _get(self, collection, doc_id):
+        doc = self.db.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def _where(self, collection, field, value):
+        docs = self.db.collection(collection).where(field, "==", value).stream()
+        return [(doc.id, doc.to_dict()) for doc in docs]
+
+    def _set(self, collection, doc_id, data, merge):
+        self.db.collection(collection).document(doc_id).set(data, merge=merge)
+
+    def _update(self, collection, doc_id, data):
+        self.db.collection(collection).document(doc_id).update(data)
+
+    def _delete(self, collection, doc_id):
+        self.db.collection(collection).document(doc_id).delete()
+
+    def _write_batch(self, writes):
+        for start in range(0, len(writes), MAX_BATCH_WRITES):
+            batch = self.db.batch()
+            for op, collection, doc_id, *data in writes[start:start + MAX_BATCH_WRITES]:
+                ref = self.db.collection(collection).document(doc_id)
+                if op == "set":
+                    batch.set(ref, data[0])
+                else:
+                    batch.delete(ref)
+            batch.commit()
+
+
+class MemoryStore(DocumentStore):
+    """In-process stand-in for Firestore, for local runs and tests"""
+
+    def __init__(self, max_workers: int = None):
+        super().__init__(max_workers)
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _docs(self, collection):
+        return self.collections.setdefault(collection, {})
+
+    def _get(self, collection, doc_id):
+        with self._lock:
+            data = self._docs(collection).get(doc_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def _where(self, collection, field, value):
+        with self._lock:
+            return [
+                (doc_id, copy.deepcopy(data))
+                for doc_id, data in self._docs(collection).items()
+                if data.get(field) == value
+            ]
+
+    def _set(self, collection, doc_id, data, merge):
+        with self._lock:
+            docs = self._docs(collection)
+            if merge and doc_id in docs:
+                docs[doc_id].update(copy.deepcopy(data))
+            else:
+                docs[doc_id] = copy.deepcopy(data)
+
+    def _update(self, collection, doc_id, data):
+        with self._lock:
+            docs = self._docs(collection)
+            if doc_id not in docs:
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            docs[doc_id].update(copy.deepcopy(data))
+
+    def _delete(self, collection, doc_id):
+        with self._lock:
+            self._docs(collection).pop(doc_id, None)
+
+    def _write_batch(self, writes):
+        # All-or-nothing, like a committed WriteBatch
+        with self._lock:
+            for op, collection, doc_id, *data in writes:
+                if op == "set":
+                    self._docs(collection)[doc_id] = copy.deepcopy(data[0])
+                else:
+                    self._docs(collection).pop(doc_id, None)
+
+
+def create_document_store() -> DocumentStore:
+    """Backend selected by settings.firestore_backend"""
+    if settings.firestore_backend == "memory":
+        return MemoryStore()
+    return FirestoreStore()
+
+
+# Global document store instance
+document_store = create_document_store()
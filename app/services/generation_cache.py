@@ -0,0 +1,78 @@
+"""
+Generation Result Cache
+
+In-process cache of generated content. Keys combine the user, the version of
+their document corpus, the content type, the tone and a hash of the normalized
+request text, so a new upload or delete makes earlier entries unreachable.
+Entries expire after a TTL and the least recently used ones are evicted once
+the cache is full.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from ..config import settings
+from ..models import ContentGenerationRequest, ContentGenerationResponse, ContentType
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Collapse whitespace and case so trivially different inputs share a key"""
+    return re.sub(r"\s+", " ", text or "").strip().casefold()
+
+
+def request_fingerprint(request: ContentGenerationRequest) -> str:
+    """Hash of the normalized free-text fields of a request"""
+    fields = (
+        request.job_description,
+        request.target_company,
+        request.target_role,
+        request.additional_context,
+    )
+    return hashlib.sha256("\x1f".join(_normalize(field) for field in fields).encode("utf-8")).hexdigest()
+
+
+def cache_key(
+    uid: str, corpus_version: int, content_type: ContentType, request: ContentGenerationRequest
+) -> Tuple[Hashable, ...]:
+    return (uid, corpus_version, content_type.value, _normalize(request.tone), request_fingerprint(request))
+
+
+class GenerationCache:
+    """TTL + LRU bounded cache of ContentGenerationResponse objects"""
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.generation_cache_ttl_seconds
+        self.max_entries = max_entries if max_entries is not None else settings.generation_cache_max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, ContentGenerationResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[ContentGenerationResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: Tuple, response: ContentGenerationResponse):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
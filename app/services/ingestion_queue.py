@@ -0,0 +1,298 @@
+"""
+Document Ingestion Queue
+
+Uploads are stored on disk and recorded as jobs in a small SQLite table (the
+app's ``DATABASE_URL``), so the HTTP request can return as soon as the bytes
+are saved. ``IngestionWorker`` runs a bounded number of asyncio workers that
+claim queued jobs and hand them to the ingestion handler (extraction,
+chunking, embedding, metadata write). Jobs survive restarts: anything that
+was mid-flight when the process stopped is queued again on startup. Jobs
+enqueued together by a bulk upload share a batch ID and are claimed and
+ingested together.
+
+When worker processes share the vector store, only the writer process runs
+the workers; read-only workers queue document deletions here as well.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..config import settings
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Job operations
+INGEST = "ingest"
+DELETE = "delete"
+
+
+@dataclass
+class IngestionJob:
+    """One uploaded document waiting for (or going through) ingestion"""
+    document_id: str
+    uid: str
+    document_type: str
+    filename: str
+    file_path: str
+    file_size: int
+    content_type: Optional[str] = None
+    is_text: bool = False  # upload decoded cleanly as UTF-8
+    status: str = QUEUED
+    pages_processed: int = 0
+    chunks_processed: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    batch_id: Optional[str] = None  # set for jobs from one bulk upload
+    operation: str = INGEST
+
+
+_COLUMNS = [field.name for field in fields(IngestionJob)]
+
+
+def _sqlite_path(database_url: str) -> str:
+    prefix = "sqlite:///"
+    if not database_url.startswith(prefix):
+        raise ValueError(f"Ingestion queue needs a sqlite:/// DATABASE_URL, got {database_url}")
+    return database_url[len(prefix):]
+
+
+class IngestionQueue:
+    """Persistent FIFO of ingestion jobs"""
+
+    def __init__(self, path: str = None):
+        self.path = path or _sqlite_path(settings.database_url)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Connection and schema, created on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    document_id TEXT PRIMARY KEY,
+                    uid TEXT NOT NULL,
+                    document_type TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    content_type TEXT,
+                    is_text INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    pages_processed INTEGER NOT NULL DEFAULT 0,
+                    chunks_processed INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ingestion_jobs)")}
+            # Columns added after the table was first created
+            for column, definition in (("batch_id", "TEXT"), ("operation", f"TEXT NOT NULL DEFAULT '{INGEST}'")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS ingestion_jobs_status ON ingestion_jobs (status, created_at)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        """Run a statement; returns the number of rows changed"""
+        with self._lock:
+            return self._db().execute(sql, params).rowcount
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        """Run a statement and fetch its rows while holding the connection"""
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _job(row) -> Optional[IngestionJob]:
+        if row is None:
+            return None
+        job = IngestionJob(**dict(zip(_COLUMNS, row)))
+        job.is_text = bool(job.is_text)
+        return job
+
+    def enqueue(self, job: IngestionJob):
+        self.enqueue_many([job])
+
+    def enqueue_many(self, jobs: List[IngestionJob]):
+        """Insert jobs in one transaction"""
+        now = time.time()
+        for job in jobs:
+            job.status = QUEUED
+            job.created_at = job.updated_at = now
+        sql = f"INSERT INTO ingestion_jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(sql, [tuple(getattr(job, column) for column in _COLUMNS) for job in jobs])
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def enqueue_deletion(self, uid: str, document_id: str):
+        """Queue the removal of an ingested document's vectors"""
+        self.enqueue(IngestionJob(
+            document_id=document_id,
+            uid=uid,
+            document_type="",
+            filename="",
+            file_path="",
+            file_size=0,
+            operation=DELETE
+        ))
+
+    def claim(self) -> List[IngestionJob]:
+        """Atomically move the oldest queued job, and the rest of its batch, to processing"""
+        rows = self._query(
+            f"""
+            UPDATE ingestion_jobs
+            SET status = ?, attempts = attempts + 1, updated_at = ?
+            WHERE status = ? AND document_id IN (
+                SELECT document_id FROM ingestion_jobs
+                WHERE document_id = (SELECT document_id FROM ingestion_jobs WHERE status = ? ORDER BY created_at LIMIT 1)
+                   OR batch_id = (SELECT batch_id FROM ingestion_jobs WHERE status = ? ORDER BY created_at LIMIT 1)
+            )
+            RETURNING {', '.join(_COLUMNS)}
+            """,
+            (PROCESSING, time.time(), QUEUED, QUEUED, QUEUED)
+        )
+        return [self._job(row) for row in rows]
+
+    def get(self, document_id: str) -> Optional[IngestionJob]:
+        rows = self._query(
+            f"SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs WHERE document_id = ?", (document_id,)
+        )
+        return self._job(rows[0] if rows else None)
+
+    def update_progress(self, document_id: str, pages_processed: int, chunks_processed: int):
+        self._execute(
+            "UPDATE ingestion_jobs SET pages_processed = ?, chunks_processed = ?, updated_at = ? WHERE document_id = ?",
+            (pages_processed, chunks_processed, time.time(), document_id)
+        )
+
+    def complete(self, document_id: str):
+        self._execute(
+            "UPDATE ingestion_jobs SET status = ?, error = NULL, updated_at = ? WHERE document_id = ?",
+            (COMPLETED, time.time(), document_id)
+        )
+
+    def fail(self, document_id: str, error: str):
+        self._execute(
+            "UPDATE ingestion_jobs SET status = ?, error = ?, updated_at = ? WHERE document_id = ?",
+            (FAILED, error, time.time(), document_id)
+        )
+
+    def remove(self, document_id: str, statuses: tuple = (QUEUED, FAILED, COMPLETED)) -> bool:
+        """Delete a job unless it is in a state other than statuses (e.g. processing)"""
+        return self._execute(
+            f"DELETE FROM ingestion_jobs WHERE document_id = ? AND status IN ({', '.join('?' * len(statuses))})",
+            (document_id, *statuses)
+        ) > 0
+
+    def jobs_for_user(self, uid: str) -> List[IngestionJob]:
+        rows = self._query(
+            f"SELECT {', '.join(_COLUMNS)} FROM ingestion_jobs WHERE uid = ? ORDER BY created_at", (uid,)
+        )
+        return [self._job(row) for row in rows]
+
+    def requeue_interrupted(self) -> int:
+        """Queue again any job left processing by a previous run"""
+        return self._execute(
+            "UPDATE ingestion_jobs SET status = ?, updated_at = ? WHERE status = ?",
+            (QUEUED, time.time(), PROCESSING)
+        )
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Forget completed jobs once their status is no longer interesting"""
+        return self._execute(
+            "DELETE FROM ingestion_jobs WHERE status = ? AND updated_at < ?",
+            (COMPLETED, time.time() - older_than_seconds)
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Ingests a claimed batch; returns the jobs that failed, by document ID
+IngestionHandler = Callable[[List[IngestionJob]], Awaitable[Dict[str, Exception]]]
+
+
+class IngestionWorker:
+    """Feeds queued jobs to a handler with bounded concurrency"""
+
+    def __init__(self, queue: IngestionQueue, concurrency: int = None):
+        self.queue = queue
+        self.concurrency = concurrency or settings.ingestion_workers
+        self.handler: Optional[IngestionHandler] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, handler: IngestionHandler):
+        """Recover interrupted jobs and start the workers"""
+        self.handler = handler
+        self._wakeup = asyncio.Event()
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted ingestion jobs")
+        self.queue.prune(settings.ingestion_job_retention_seconds)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+
+    def notify(self):
+        """Wake idle workers after a job has been enqueued"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            # Cleared before claiming so an enqueue in between is not missed
+            self._wakeup.clear()
+            jobs = await asyncio.to_thread(self.queue.claim)
+            if not jobs:
+                try:
+                    # Polling is only a fallback; enqueue() callers notify()
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                failures = await self.handler(jobs)
+            except asyncio.CancelledError:
+                # Left in processing; requeued on the next start
+                raise
+            except Exception as e:
+                failures = {job.document_id: e for job in jobs}
+            for job in jobs:
+                error = failures.get(job.document_id)
+                if error is None:
+                    await asyncio.to_thread(self.queue.complete, job.document_id)
+                else:
+                    print(f"Ingestion of {job.document_id} failed: {error}")
+                    await asyncio.to_thread(self.queue.fail, job.document_id, str(error))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+# Global ingestion queue and worker instances
+ingestion_queue = IngestionQueue()
+ingestion_worker = IngestionWorker(ingestion_queue)
@@ -0,0 +1,142 @@
+"""
+Gemini LLM Client
+
+Async client for the Gemini ``generateContent`` REST API. A single pooled
+``httpx.AsyncClient`` is reused for every call so connections stay warm, each
+call has its own timeout, and nothing blocks the event loop. ``stream`` yields
+text deltas from the server-sent-events variant of the API. The base URL is
+configurable so the client can be pointed at a local fake server.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from ..config import settings
+
+
+class LLMError(Exception):
+    """Raised when the LLM call fails or returns no content"""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when the LLM call exceeds its timeout"""
+
+
+@dataclass
+class LLMResponse:
+    """Text generated by the model plus token usage when reported"""
+    text: str
+    total_tokens: Optional[int] = None
+    fallback: bool = False  # canned content used because the model was unavailable
+
+
+class GeminiClient:
+    """Reusable, non-blocking client for Gemini text generation"""
+
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = None,
+        base_url: str = None,
+        timeout: float = None,
+        max_connections: int = None
+    ):
+        self.api_key = api_key if api_key is not None else settings.google_api_key
+        self.model = model or settings.gemini_model
+        self.base_url = (base_url or settings.gemini_api_base_url).rstrip("/")
+        self.timeout = timeout or settings.llm_timeout_seconds
+        self.max_connections = max_connections or settings.llm_max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        """Whether an API key is available"""
+        return bool(self.api_key)
+
+    def _http(self) -> httpx.AsyncClient:
+        """Shared connection pool, created on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"x-goog-api-key": self.api_key},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=self.timeout
+            )
+        return self._client
+
+    def _request_body(self, prompt: str) -> Dict[str, Any]:
+        return {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+
+    @staticmethod
+    def _extract_text(payload: Dict[str, Any]) -> str:
+        parts = []
+        for candidate in payload.get("candidates", [])[:1]:
+            for part in candidate.get("content", {}).get("parts", []):
+                parts.append(part.get("text", ""))
+        return "".join(parts)
+
+    async def generate(self, prompt: str, timeout: float = None, model: str = None) -> LLMResponse:
+        """Generate a completion for the prompt"""
+        path = f"/v1beta/models/{model or self.model}:generateContent"
+        try:
+            response = await self._http().post(
+                path,
+                json=self._request_body(prompt),
+                timeout=timeout or self.timeout
+            )
+            response.raise_for_status()
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"Gemini call timed out: {e}") from e
+        except httpx.HTTPError as e:
+            raise LLMError(f"Gemini call failed: {e}") from e
+
+        payload = response.json()
+        text = self._extract_text(payload)
+        if not text:
+            raise LLMError("No content generated from Gemini API")
+        return LLMResponse(
+            text=text,
+            total_tokens=payload.get("usageMetadata", {}).get("totalTokenCount")
+        )
+
+    async def stream(self, prompt: str, timeout: float = None, model: str = None) -> AsyncIterator[LLMResponse]:
+        """Yield text deltas as the model produces them
+        
+        The final delta carries total_tokens when the API reports usage.
+        """
+        path = f"/v1beta/models/{model or self.model}:streamGenerateContent"
+        try:
+            async with self._http().stream(
+                "POST",
+                path,
+                params={"alt": "sse"},
+                json=self._request_body(prompt),
+                timeout=timeout or self.timeout
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = json.loads(line[len("data:"):].strip())
+                    yield LLMResponse(
+                        text=self._extract_text(payload),
+                        total_tokens=payload.get("usageMetadata", {}).get("totalTokenCount")
+                    )
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"Gemini stream timed out: {e}") from e
+        except httpx.HTTPError as e:
+            raise LLMError(f"Gemini stream failed: {e}") from e
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global LLM client instance
+llm_client = GeminiClient()
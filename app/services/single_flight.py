@@ -0,0 +1,86 @@
+"""
+Single-flight Request Coalescing
+
+Concurrent identical calls (a double-clicked Generate button, client retries)
+share one in-flight computation instead of each running retrieval and an LLM
+call. ``do`` coalesces awaitables; ``stream`` coalesces async iterators, with
+late joiners replaying the items already produced before following live.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class _Broadcast:
+    """Fans one async iterator out to any number of subscribers"""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]):
+        try:
+            async for item in source:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.items) or self.done)
+                pending = self.items[position:]
+                finished = self.done
+            for item in pending:
+                yield item
+            position += len(pending)
+            if finished and position == len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn(), or the identical call already in flight"""
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(self._calls, key, done))
+        # Shielded so one caller going away doesn't cancel the others
+        return await asyncio.shield(call)
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Iterate fn(), or join the identical stream already in flight"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(fn())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda done: self._forget(self._streams, key, broadcast))
+        async for item in broadcast.subscribe():
+            yield item
+
+    @staticmethod
+    def _forget(calls: Dict[Hashable, Any], key: Hashable, call: Any):
+        if calls.get(key) is call:
+            del calls[key]
+        if isinstance(call, asyncio.Future) and not call.cancelled():
+            # Mark the error as retrieved in case every caller went away
+            call.exception()
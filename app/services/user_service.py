@@ -1,110 +1,387 @@
 import os
 import uuid
+import asyncio
 import json
+import codecs
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple, Union
 from fastapi import HTTPException, UploadFile
 import aiofiles
-from ..models import UserProfile, UserDocument, DocumentType
+from ..models import UserProfile, UserDocument, DocumentType, LinkSubmission
 from ..config import settings
-from ..rag import VectorStore
-from firebase_admin import firestore
+from ..rag import VectorStore, vectorstore
+from .firestore_store import DocumentStore, document_store
+from .extraction_service import ExtractionService, extraction_service
+from .ingestion_queue import (
+    COMPLETED, DELETE, INGEST, IngestionJob, IngestionQueue, IngestionWorker, ingestion_queue, ingestion_worker
+)
+from ..extractors import ExtractionError
 
 class UserService:
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.db = firestore.client()
+    def __init__(
+        self,
+        vector_store: Optional[VectorStore] = None,
+        store: Optional[DocumentStore] = None,
+        extraction: Optional[ExtractionService] = None,
+        queue: Optional[IngestionQueue] = None,
+        worker: Optional[IngestionWorker] = None
+    ):
+        # Shares the process-wide store so uploads are visible to content generation
+        self.vector_store = vector_store or vectorstore
+        # Firestore calls run off the event loop
+        self.store = store or document_store
+        # PDF/DOCX/RTF parsing runs in worker processes
+        self.extraction = extraction or extraction_service
+        # Uploads are ingested in the background from a persistent queue
+        self.ingestion_queue = queue or ingestion_queue
+        self.ingestion_worker = worker or ingestion_worker
 
     # --- User methods ---
     async def create_or_update_user(self, user_data: dict) -> UserProfile:
         """Create or update a user (basic info only)"""
         uid = user_data["uid"]
-        doc_ref = self.db.collection("users").document(uid)
-        doc_ref.set(user_data, merge=True)
+        await self.store.set("users", uid, user_data, merge=True)
         return await self.get_user(uid)
 
     async def get_user(self, uid: str) -> Optional[UserProfile]:
-        doc_ref = self.db.collection("users").document(uid)
-        doc = doc_ref.get()
-        if doc.exists:
-            return UserProfile(**doc.to_dict())
+        data = await self.store.get("users", uid)
+        if data is not None:
+            return UserProfile(**data)
         return None
 
     async def update_user(self, uid: str, update_data: dict) -> UserProfile:
         """Update user details (basic info only)"""
-        doc_ref = self.db.collection("users").document(uid)
-        doc_ref.update(update_data)
+        await self.store.update("users", uid, update_data)
         return await self.get_user(uid)
 
     async def delete_user(self, uid: str) -> bool:
         """Delete user and all their documents"""
-        # Delete user document
-        doc_ref = self.db.collection("users").document(uid)
-        doc_ref.delete()
-        # Delete all user documents
-        docs = self.db.collection("user_documents").where("uid", "==", uid).stream()
-        for doc in docs:
-            await self.delete_document(uid, doc.id)
+        # Queued uploads and finished jobs go first; deletions may be queued under the same IDs
+        for job in await asyncio.to_thread(self.ingestion_queue.jobs_for_user, uid):
+            if job.operation != INGEST:
+                continue
+            if not await asyncio.to_thread(self.ingestion_queue.remove, job.document_id):
+                continue
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            if job.status != COMPLETED:
+                # A failed ingest may have left chunks without a document record
+                await self._delete_vectors(uid, job.document_id)
+        docs = await self.store.where("user_documents", "uid", uid)
+        for document_id, doc_data in docs:
+            await self._delete_vectors(uid, document_id)
+            self._remove_file(doc_data)
+        # User record and all document records go in batched commits
+        await self.store.write_batch(
+            deletes=[("users", uid)] + [("user_documents", document_id) for document_id, _ in docs]
+        )
         return True
 
     # --- Document methods ---
-    async def upload_document(self, uid: str, file: UploadFile, document_type: DocumentType) -> UserDocument:
+    async def upload_document(self, uid: str, file: UploadFile, document_type: DocumentType) -> IngestionJob:
+        """Store the upload and queue it for ingestion; returns the queued job"""
         if file.size and file.size > settings.max_file_size:
-            raise HTTPException(status_code=400, detail="File too large")
+            raise HTTPException(status_code=413, detail="File too large")
         document_id = str(uuid.uuid4())
         file_path = os.path.join(settings.upload_dir, f"{document_id}_{file.filename}")
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        text_content = await self._extract_text(file_path, file.filename)
-        document = UserDocument(
-            uid=uid,
+        file_size, is_text = await self._save_upload(file, file_path)
+        job = IngestionJob(
             document_id=document_id,
-            document_type=document_type,
+            uid=uid,
+            document_type=document_type.value,
             filename=file.filename,
-            content=text_content,
-            metadata={
-                "file_path": file_path,
-                "file_size": len(content),
-                "content_type": file.content_type
-            }
+            file_path=file_path,
+            file_size=file_size,
+            content_type=file.content_type,
+            is_text=is_text
         )
-        doc_ref = self.db.collection("user_documents").document(document_id)
-        doc_ref.set(document.dict())
-        await self.vector_store.add_document(
-            document_id=document_id,
+        await asyncio.to_thread(self.ingestion_queue.enqueue, job)
+        self.ingestion_worker.notify()
+        return job
+
+    async def upload_documents(
+        self,
+        uid: str,
+        files: List[UploadFile],
+        document_types: List[DocumentType],
+        links: List[LinkSubmission]
+    ) -> List[Tuple[str, DocumentType, Union[IngestionJob, HTTPException]]]:
+        """Store several files and links and queue them as one ingestion batch
+        
+        Returns (filename, document_type, job or rejection) for every item.
+        """
+        if len(files) + len(links) > settings.max_bulk_files:
+            raise HTTPException(status_code=400, detail=f"At most {settings.max_bulk_files} files and links per upload")
+        if len(document_types) == 1:
+            document_types = document_types * len(files)
+        elif not document_types:
+            document_types = [DocumentType.OTHER] * len(files)
+        elif len(document_types) != len(files):
+            raise HTTPException(status_code=400, detail="Provide one document type, or one per file")
+        
+        batch_id = str(uuid.uuid4())
+        results: List[Tuple[str, DocumentType, Union[IngestionJob, HTTPException]]] = []
+        jobs: List[IngestionJob] = []
+        for file, document_type in zip(files, document_types):
+            document_id = str(uuid.uuid4())
+            file_path = os.path.join(settings.upload_dir, f"{document_id}_{file.filename}")
+            try:
+                if file.size and file.size > settings.max_file_size:
+                    raise HTTPException(status_code=413, detail="File too large")
+                file_size, is_text = await self._save_upload(file, file_path)
+            except HTTPException as e:
+                results.append((file.filename, document_type, e))
+                continue
+            job = IngestionJob(
+                document_id=document_id,
+                uid=uid,
+                document_type=document_type.value,
+                filename=file.filename,
+                file_path=file_path,
+                file_size=file_size,
+                content_type=file.content_type,
+                is_text=is_text,
+                batch_id=batch_id
+            )
+            jobs.append(job)
+            results.append((file.filename, document_type, job))
+        
+        for link in links:
+            # Links are stored as small text documents, like the single-link upload
+            document_id = str(uuid.uuid4())
+            filename = f"{link.document_type.value}_link.txt"
+            if not link.url.startswith(("http://", "https://")):
+                results.append((filename, link.document_type, HTTPException(status_code=400, detail="Invalid URL")))
+                continue
+            file_path = os.path.join(settings.upload_dir, f"{document_id}_{filename}")
+            content = f"URL: {link.url}\nType: {link.document_type.value}\nDescription: {link.description or 'No description provided'}"
+            async with aiofiles.open(file_path, 'w', encoding='utf-8') as f:
+                await f.write(content)
+            job = IngestionJob(
+                document_id=document_id,
+                uid=uid,
+                document_type=link.document_type.value,
+                filename=filename,
+                file_path=file_path,
+                file_size=len(content.encode("utf-8")),
+                content_type="text/plain",
+                is_text=True,
+                batch_id=batch_id
+            )
+            jobs.append(job)
+            results.append((filename, link.document_type, job))
+        
+        if jobs:
+            await asyncio.to_thread(self.ingestion_queue.enqueue_many, jobs)
+            self.ingestion_worker.notify()
+        return results
+
+    async def ingest_documents(self, jobs: List[IngestionJob]) -> Dict[str, Exception]:
+        """Ingestion worker handler; returns the jobs that failed, by document ID"""
+        if jobs[0].operation == DELETE:
+            # Queued by a read-only worker
+            for job in jobs:
+                await self.vector_store.delete_document(job.document_id)
+            return {}
+        if len(jobs) == 1:
+            await self.ingest_document(jobs[0])
+            return {}
+        return await self._ingest_batch(jobs)
+
+    async def _ingest_batch(self, jobs: List[IngestionJob]) -> Dict[str, Exception]:
+        """Extract a bulk upload in parallel, then embed and record it all at once"""
+        async def extract(job: IngestionJob) -> List[str]:
+            return [page async for page in self._extract_pages(job.file_path, job.filename, job.is_text)]
+        
+        extracted = await asyncio.gather(*(extract(job) for job in jobs), return_exceptions=True)
+        failures: Dict[str, Exception] = {}
+        ready: List[Tuple[IngestionJob, List[str]]] = []
+        for job, pages in zip(jobs, extracted):
+            if isinstance(pages, Exception):
+                failures[job.document_id] = pages
+                if os.path.exists(job.file_path):
+                    os.remove(job.file_path)
+            else:
+                ready.append((job, pages))
+        if not ready:
+            return failures
+        
+        chunk_counts = await self.vector_store.add_document_batch([
+            (job.document_id, pages, {
+                "uid": job.uid,
+                "document_type": job.document_type,
+                "filename": job.filename
+            })
+            for job, pages in ready
+        ])
+        documents = [
+            UserDocument(
+                uid=job.uid,
+                document_id=job.document_id,
+                document_type=DocumentType(job.document_type),
+                filename=job.filename,
+                content="\n\n".join(pages),
+                metadata={
+                    "file_path": job.file_path,
+                    "file_size": job.file_size,
+                    "content_type": job.content_type
+                }
+            )
+            for job, pages in ready
+        ]
+        try:
+            await self.store.write_batch(
+                sets=[("user_documents", document.document_id, document.dict()) for document in documents]
+            )
+        except Exception:
+            # The chunks must not stay searchable without document records
+            for job, pages in ready:
+                await self._delete_vectors(job.uid, job.document_id)
+            raise
+        for job, pages in ready:
+            await asyncio.to_thread(
+                self.ingestion_queue.update_progress, job.document_id, len(pages), chunk_counts[job.document_id]
+            )
+        return failures
+
+    async def ingest_document(self, job: IngestionJob):
+        """Extract, chunk and embed a queued upload, then record it (run by the ingestion worker)"""
+        async def report_progress(pages: int, chunks: int):
+            await asyncio.to_thread(self.ingestion_queue.update_progress, job.document_id, pages, chunks)
+        
+        try:
+            # Pages are chunked and embedded while later pages are still being extracted
+            text_content = await self.vector_store.add_document_pages(
+                document_id=job.document_id,
+                pages=self._extract_pages(job.file_path, job.filename, job.is_text),
+                metadata={
+                    "uid": job.uid,
+                    "document_type": job.document_type,
+                    "filename": job.filename
+                },
+                progress=report_progress
+            )
+        except ExtractionError:
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            raise
+        document = UserDocument(
+            uid=job.uid,
+            document_id=job.document_id,
+            document_type=DocumentType(job.document_type),
+            filename=job.filename,
             content=text_content,
             metadata={
-                "uid": uid,
-                "document_type": document_type.value,
-                "filename": file.filename
+                "file_path": job.file_path,
+                "file_size": job.file_size,
+                "content_type": job.content_type
             }
         )
-        return document
+        try:
+            await self.store.set("user_documents", job.document_id, document.dict())
+        except Exception:
+            # The chunks must not stay searchable without a document record
+            await self._delete_vectors(job.uid, job.document_id)
+            raise
+
+    async def get_document_status(self, uid: str, document_id: str) -> IngestionJob:
+        job = await asyncio.to_thread(self.ingestion_queue.get, document_id)
+        if job is None or job.uid != uid or job.operation != INGEST:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return job
 
-    async def _extract_text(self, file_path: str, filename: str) -> str:
+    async def _save_upload(self, file: UploadFile, file_path: str) -> Tuple[int, bool]:
+        """Stream an upload to disk in fixed-size chunks, enforcing max_file_size
+        
+        Returns the size in bytes and whether the file is valid UTF-8 text.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        is_text = True
+        size = 0
         try:
-            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-                return await f.read()
+            async with aiofiles.open(file_path, 'wb') as f:
+                while True:
+                    chunk = await file.read(settings.upload_chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > settings.max_file_size:
+                        raise HTTPException(status_code=413, detail="File too large")
+                    await f.write(chunk)
+                    if is_text:
+                        try:
+                            decoder.decode(chunk)
+                        except UnicodeDecodeError:
+                            is_text = False
+            if is_text:
+                decoder.decode(b"", final=True)
         except UnicodeDecodeError:
-            return f"Document: {filename}"
+            is_text = False
+        except BaseException:
+            # Never leave a partial upload behind
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        return size, is_text
+
+    async def _extract_pages(self, file_path: str, filename: str, is_text: bool) -> AsyncIterator[str]:
+        """Text of the upload, page by page where the format has pages"""
+        if self.extraction.supports(filename):
+            extracted = False
+            async for page in self.extraction.extract(file_path, filename):
+                extracted = True
+                yield page
+            if not extracted:
+                # e.g. a scanned PDF with no text layer
+                yield f"Document: {filename}"
+        elif is_text:
+            async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
+                yield await f.read()
+        else:
+            yield f"Document: {filename}"
 
     async def get_user_documents(self, uid: str) -> List[UserDocument]:
-        docs = self.db.collection("user_documents").where("uid", "==", uid).stream()
-        return [UserDocument(**doc.to_dict()) for doc in docs]
+        docs = await self.store.where("user_documents", "uid", uid)
+        return [UserDocument(**doc_data) for _, doc_data in docs]
 
     async def delete_document(self, uid: str, document_id: str) -> bool:
-        doc_ref = self.db.collection("user_documents").document(document_id)
-        doc = doc_ref.get()
-        if not doc.exists:
+        doc_data = await self.store.get("user_documents", document_id)
+        if doc_data is None:
+            return await self._delete_pending_document(uid, document_id)
+        # The finished job goes first; a deletion may be queued under the same ID
+        job = await asyncio.to_thread(self.ingestion_queue.get, document_id)
+        if job is not None and not await asyncio.to_thread(self.ingestion_queue.remove, document_id):
+            raise HTTPException(status_code=409, detail="Document is still being processed")
+        await self._delete_vectors(uid, document_id)
+        self._remove_file(doc_data)
+        await self.store.delete("user_documents", document_id)
+        return True
+
+    async def _delete_vectors(self, uid: str, document_id: str):
+        """Remove a document's chunks; read-only workers hand this to the writer process"""
+        if self.vector_store.read_only:
+            await asyncio.to_thread(self.ingestion_queue.enqueue_deletion, uid, document_id)
+        else:
+            await self.vector_store.delete_document(document_id)
+
+    async def _delete_pending_document(self, uid: str, document_id: str) -> bool:
+        """Drop an upload that has not finished ingestion"""
+        job = await asyncio.to_thread(self.ingestion_queue.get, document_id)
+        if job is None or job.uid != uid or job.operation != INGEST:
             raise HTTPException(status_code=404, detail="Document not found")
-        doc_data = doc.to_dict()
-        await self.vector_store.delete_document(document_id)
+        if not await asyncio.to_thread(self.ingestion_queue.remove, document_id):
+            raise HTTPException(status_code=409, detail="Document is still being processed")
+        if os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        # A failed ingest may have committed chunks before its document record was written
+        await self._delete_vectors(uid, document_id)
+        return True
+
+    @staticmethod
+    def _remove_file(doc_data: Dict[str, Any]):
         file_path = doc_data.get("metadata", {}).get("file_path")
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
-        doc_ref.delete()
-        return True
 
     async def get_user_rag_context(self, uid: str) -> str:
         documents = await self.get_user_documents(uid)
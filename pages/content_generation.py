@@ -4,6 +4,7 @@ import os
 from dotenv import load_dotenv
 from app.sidebar import show_sidebar
 import pyperclip
+import json
 from datetime import datetime
 
 # Hide default page navigation with CSS
@@ -20,6 +21,34 @@ st.markdown("""
 
 load_dotenv()
 API_BASE_URL = "http://localhost:8000"
+
+def stream_content(request_data, placeholder):
+    """Call the streaming endpoint, rendering text as it arrives; returns the final response"""
+    headers = {"Authorization": f"Bearer {st.session_state.token}"}
+    streamed_text = ""
+    event = None
+    with requests.post(
+        f"{API_BASE_URL}/content/generate/stream",
+        json=request_data,
+        headers=headers,
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):].strip())
+                if event == "token":
+                    streamed_text += data["text"]
+                    placeholder.markdown(streamed_text + "▌")
+                elif event == "complete":
+                    return data
+                elif event == "error":
+                    raise RuntimeError(data["detail"])
+    raise RuntimeError("Stream ended before the content was complete")
+
 show_sidebar()
 st.header("✨ Content Generation")
 
@@ -108,11 +137,12 @@ if st.button("Generate Content", type="primary"):
                 "additional_context": additional_context,
                 "tone": tone
             }
-            headers = {"Authorization": f"Bearer {st.session_state.token}"}
-            response = requests.post(f"{API_BASE_URL}/content/generate", json=request_data, headers=headers)
-            if response.status_code == 200:
-                result = response.json()
-                
+            # Render tokens as they stream in; the final event carries the full response
+            try:
+                result = stream_content(request_data, st.empty())
+            except RuntimeError as e:
+                st.error(f"❌ Error generating content: {str(e)}")
+            else:
                 # Store the generated content and details in session state
                 st.session_state.generated_content = result["generated_content"]
                 st.session_state.content_type = result["content_type"]
@@ -123,8 +153,6 @@ if st.button("Generate Content", type="primary"):
                 
                 st.success("✅ Content generated successfully!")
                 st.rerun()
-            else:
-                st.error(f"❌ Error generating content: {response.text}")
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
 
@@ -173,13 +201,14 @@ if hasattr(st.session_state, 'generated_content') and st.session_state.generated
                     "target_company": target_company,
                     "target_role": target_role,
                     "additional_context": additional_context,
-                    "tone": st.session_state.tone
+                    "tone": st.session_state.tone,
+                    "regenerate": True
                 }
-                headers = {"Authorization": f"Bearer {st.session_state.token}"}
-                response = requests.post(f"{API_BASE_URL}/content/generate", json=request_data, headers=headers)
-                if response.status_code == 200:
-                    result = response.json()
-                    
+                try:
+                    result = stream_content(request_data, st.empty())
+                except RuntimeError as e:
+                    st.error(f"❌ Error regenerating content: {str(e)}")
+                else:
                     # Update the generated content in session state
                     st.session_state.generated_content = result["generated_content"]
                     st.session_state.generation_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -188,8 +217,6 @@ if hasattr(st.session_state, 'generated_content') and st.session_state.generated
                     
                     st.success("✅ Content regenerated successfully!")
                     st.rerun()
-                else:
-                    st.error(f"❌ Error regenerating content: {response.text}")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
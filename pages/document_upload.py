@@ -1,6 +1,7 @@
 import streamlit as st
 import requests
 import os
+import time
 from dotenv import load_dotenv
 from app.sidebar import show_sidebar
 
@@ -34,8 +35,28 @@ if not st.session_state.get("authenticated"):
 
 st.write("Upload your professional documents or add links for personalized content generation.")
 
+def wait_for_processing(upload_response, headers, timeout_seconds=300):
+    """Poll the ingestion status of an accepted upload; returns the final status"""
+    status_url = f"{API_BASE_URL}{upload_response['status_url']}"
+    progress = st.progress(0.0, text="⏳ Queued for processing...")
+    deadline = time.time() + timeout_seconds
+    status = upload_response
+    while time.time() < deadline:
+        response = requests.get(status_url, headers=headers)
+        if response.status_code != 200:
+            break
+        status = response.json()
+        if status["status"] in ("completed", "failed"):
+            break
+        if status["status"] == "processing":
+            progress.progress(0.5, text=f"⚙️ Processing... {status['pages_processed']} pages, {status['chunks_processed']} chunks")
+        time.sleep(1)
+    progress.empty()
+    return status
+
+
 # Choose between file upload or link
-upload_type = st.radio("Choose upload type:", ["📁 Upload File", "🔗 Add Link"])
+upload_type = st.radio("Choose upload type:", ["📁 Upload File", "📚 Bulk Upload", "🔗 Add Link"])
 
 if upload_type == "📁 Upload File":
     # File upload section
@@ -64,14 +85,71 @@ if upload_type == "📁 Upload File":
             data = {"document_type": doc_type}
             headers = {"Authorization": f"Bearer {st.session_state.token}"}
             response = requests.post(f"{API_BASE_URL}/user/documents/upload", files=files, data=data, headers=headers)
-            if response.status_code == 200:
-                st.success("✅ Document uploaded successfully!")
-                st.rerun()
+            if response.status_code == 202:
+                status = wait_for_processing(response.json(), headers)
+                if status["status"] == "completed":
+                    st.success("✅ Document uploaded successfully!")
+                    st.rerun()
+                elif status["status"] == "failed":
+                    st.error(f"❌ Error processing document: {status.get('error')}")
+                else:
+                    st.info("⏳ Document is still processing; it will appear below when ready.")
             else:
                 st.error(f"❌ Error uploading document: {response.text}")
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
 
+elif upload_type == "📚 Bulk Upload":
+    # Several files of the same type, ingested together
+    st.subheader("📚 Bulk Upload")
+    
+    bulk_doc_type = st.selectbox(
+        "Document Type", 
+        [
+            "resume", 
+            "cover_letter",  
+            "portfolio", 
+            "certificate", 
+            "project", 
+            "publication", 
+            "other"
+        ], 
+        format_func=lambda x: x.replace("_", " ").title(),
+        key="bulk_document_type"
+    )
+    
+    uploaded_files = st.file_uploader("Choose files", type=['txt', 'pdf', 'docx', 'md', 'rtf'], accept_multiple_files=True)
+    
+    if uploaded_files and st.button("Upload Documents", type="primary"):
+        try:
+            files = [("files", (f.name, f, f.type)) for f in uploaded_files]
+            data = {"document_types": bulk_doc_type}
+            headers = {"Authorization": f"Bearer {st.session_state.token}"}
+            response = requests.post(f"{API_BASE_URL}/user/documents/bulk-upload", files=files, data=data, headers=headers)
+            if response.status_code == 202:
+                results = response.json()["results"]
+                all_completed = True
+                for result in results:
+                    if result["status"] == "rejected":
+                        all_completed = False
+                        st.error(f"❌ {result['filename']}: {result['message']}")
+                        continue
+                    status = wait_for_processing(result, headers)
+                    if status["status"] == "completed":
+                        st.success(f"✅ {result['filename']} uploaded successfully!")
+                    elif status["status"] == "failed":
+                        all_completed = False
+                        st.error(f"❌ {result['filename']}: {status.get('error')}")
+                    else:
+                        all_completed = False
+                        st.info(f"⏳ {result['filename']} is still processing; it will appear below when ready.")
+                if all_completed:
+                    st.rerun()
+            else:
+                st.error(f"❌ Error uploading documents: {response.text}")
+        except Exception as e:
+            st.error(f"❌ Error: {str(e)}")
+
 else:
     # Link section
     st.subheader("🔗 Add Link")
@@ -108,9 +186,15 @@ else:
                 data = {"document_type": link_type}
                 headers = {"Authorization": f"Bearer {st.session_state.token}"}
                 response = requests.post(f"{API_BASE_URL}/user/documents/upload", files=files, data=data, headers=headers)
-                if response.status_code == 200:
-                    st.success("✅ Link added successfully!")
-                    st.rerun()
+                if response.status_code == 202:
+                    status = wait_for_processing(response.json(), headers)
+                    if status["status"] == "completed":
+                        st.success("✅ Link added successfully!")
+                        st.rerun()
+                    elif status["status"] == "failed":
+                        st.error(f"❌ Error processing link: {status.get('error')}")
+                    else:
+                        st.info("⏳ Link is still processing; it will appear below when ready.")
                 else:
                     st.error(f"❌ Error adding link: {response.text}")
             except Exception as e:
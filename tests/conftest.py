@@ -0,0 +1,5 @@
+import os
+
+# Settings are read at import time; tests need neither Firebase credentials nor Firestore
+os.environ.setdefault("FIREBASE_WEB_API_KEY", "test")
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
@@ -0,0 +1,132 @@
+import pytest
+
+import app.auth as auth_module
+from app.auth import CertificateCache, TokenCache
+from app.config import settings
+
+TOKEN = "header.payload.signature"
+
+
+class Clock:
+    """Stands in for the time module so expiry can be stepped through"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth_module, "time", clock)
+    return clock
+
+
+def claims_until(exp: float) -> dict:
+    return {
+        "iss": f"https://securetoken.google.com/{settings.firebase_project_id}",
+        "sub": "alice",
+        "exp": exp,
+    }
+
+
+def test_ttl_never_passes_the_token_exp(clock):
+    cache = TokenCache(max_entries=10)
+    cache.put(TOKEN, claims_until(clock.now + 30))
+
+    clock.now += 29
+    assert cache.get(TOKEN)["sub"] == "alice"
+    clock.now += 1
+    assert cache.get(TOKEN) is None
+
+
+def test_claims_without_exp_are_not_cached(clock):
+    cache = TokenCache(max_entries=10)
+    cache.put(TOKEN, {"sub": "alice"})
+    assert cache.get(TOKEN) is None
+
+
+def test_least_recently_used_token_is_evicted(clock):
+    cache = TokenCache(max_entries=2)
+    for token in ("a", "b"):
+        cache.put(token, claims_until(clock.now + 60))
+    cache.get("a")
+    cache.put("c", claims_until(clock.now + 60))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_expired_token_is_evicted_and_re_verified(clock, monkeypatch):
+    decoded = []
+
+    def decode(token, certs, audience):
+        decoded.append(token)
+        return claims_until(clock.now + 60)
+
+    monkeypatch.setattr(auth_module, "token_cache", TokenCache(max_entries=10))
+    monkeypatch.setattr(auth_module.certificate_cache, "get", lambda key_id=None: {"kid": "cert"})
+    monkeypatch.setattr(auth_module.google_jwt, "decode_header", lambda token: {"kid": "kid"})
+    monkeypatch.setattr(auth_module.google_jwt, "decode", decode)
+    monkeypatch.delenv("FIREBASE_AUTH_EMULATOR_HOST", raising=False)
+
+    assert auth_module.verify_firebase_token(TOKEN)["uid"] == "alice"
+    auth_module.verify_firebase_token(TOKEN)
+    assert len(decoded) == 1
+
+    clock.now += 60
+    assert auth_module.verify_firebase_token(TOKEN)["uid"] == "alice"
+    assert len(decoded) == 2
+    # The re-verified claims carry the new exp, so the entry is live again
+    assert auth_module.token_cache.get(TOKEN)["exp"] == clock.now + 60
+
+
+class Response:
+    def __init__(self, max_age: int, certs: dict):
+        self.headers = {"Cache-Control": f"public, max-age={max_age}"}
+        self.certs = certs
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.certs
+
+
+def test_certificates_refresh_when_max_age_runs_out(clock, monkeypatch):
+    fetches = []
+
+    def get(url, timeout):
+        fetches.append(url)
+        return Response(max_age=100, certs={"kid-1": f"cert {len(fetches)}"})
+
+    monkeypatch.setattr(auth_module.requests, "get", get)
+    cache = CertificateCache(url="https://certs.example")
+
+    assert cache.get() == {"kid-1": "cert 1"}
+    clock.now += 99
+    assert cache.get("kid-1") == {"kid-1": "cert 1"}
+    clock.now += 1
+    assert cache.get("kid-1") == {"kid-1": "cert 2"}
+    assert len(fetches) == 2
+
+
+def test_unknown_key_id_refetches_at_most_once_a_minute(clock, monkeypatch):
+    fetches = []
+
+    def get(url, timeout):
+        fetches.append(url)
+        return Response(max_age=3600, certs={"kid-1": "cert"})
+
+    monkeypatch.setattr(auth_module.requests, "get", get)
+    cache = CertificateCache(url="https://certs.example")
+    cache.get()
+
+    cache.get("forged")
+    assert len(fetches) == 1
+    clock.now += CertificateCache.MIN_REFRESH_SECONDS
+    cache.get("forged")
+    cache.get("forged")
+    assert len(fetches) == 2
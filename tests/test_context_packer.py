@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+
+from app.rag.config import faiss_config
+from app.rag.context_packer import (
+    NO_DOCUMENTS, RETRIEVAL_ERROR, estimate_tokens, merge_adjacent, mmr, pack_context
+)
+
+
+def chunk(text: str, document_id: str = "resume", chunk_id: int = None) -> Document:
+    metadata = {"document_type": "resume", "document_id": document_id}
+    if chunk_id is not None:
+        metadata["chunk_id"] = chunk_id
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_mmr_drops_near_duplicates():
+    vectors = np.array([
+        [1.0, 0.0, 0.0],
+        [0.99, 0.01, 0.0],  # near-duplicate of the best candidate
+        [0.0, 1.0, 0.0],
+        [0.0, 0.0, 1.0],
+    ], dtype=np.float32)
+    scores = [1.0, 0.95, 0.9, 0.5]
+
+    assert mmr(scores, vectors, 2, faiss_config.context_mmr_lambda) == [0, 2]
+    # Pure relevance keeps the duplicate
+    assert mmr(scores, vectors, 2, 1.0) == [0, 1]
+
+
+def test_adjacent_chunks_merge_without_repeating_the_overlap():
+    first = chunk("Led the migration to Kubernetes across three regions", chunk_id=4)
+    second = chunk("across three regions, cutting deploy time by half", chunk_id=5)
+    other = chunk("Unrelated chunk further down", chunk_id=9)
+
+    merged = merge_adjacent([second, other, first], max_overlap=faiss_config.chunk_overlap)
+    assert [doc.page_content for doc in merged] == [
+        "Led the migration to Kubernetes across three regions, cutting deploy time by half",
+        "Unrelated chunk further down",
+    ]
+
+
+@pytest.mark.parametrize("content_type, budget", sorted(faiss_config.context_token_budgets.items()))
+def test_packed_context_stays_within_the_budget(content_type, budget):
+    rng = np.random.default_rng(len(content_type))
+    words = ["python", "kafka", "latency", "mentored", "api", "terraform", "on-call", "postgres"]
+    segments = [chunk(" ".join(rng.choice(words, size=int(rng.integers(20, 120)))), chunk_id=i * 2)
+                for i in range(60)]
+
+    context = pack_context(segments, budget)
+    assert estimate_tokens(context) <= budget
+    assert context.startswith(f"Document Type: resume\nContent: {segments[0].page_content}")
+
+
+@pytest.mark.parametrize("budget", sorted(faiss_config.context_token_budgets.values()))
+def test_separators_count_against_the_budget(budget):
+    # Every formatted segment is exactly 40 characters (10 tokens) long
+    overhead = len("Document Type: resume\nContent: \n---")
+    segments = [chunk("x" * (40 - overhead)) for _ in range(budget)]
+
+    context = pack_context(segments, budget)
+    assert estimate_tokens(context) <= budget
+
+
+@pytest.mark.parametrize("budget", sorted(faiss_config.context_token_budgets.values()))
+def test_oversized_first_segment_is_truncated_to_the_budget(budget):
+    segment = chunk("distributed systems " * budget)
+    context = pack_context([segment], budget)
+    assert 0 < estimate_tokens(context) <= budget
+    assert context.endswith("systems\n---")
+
+
+def test_missing_segments():
+    assert pack_context(None, 100) == RETRIEVAL_ERROR
+    assert pack_context([], 100) == NO_DOCUMENTS
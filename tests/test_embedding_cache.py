@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+
+from app.rag.embedding_cache import EmbeddingCache
+
+MODEL = "test-model"
+
+
+def vector(seed: float, dim: int = 4):
+    return [seed + i for i in range(dim)]
+
+
+def test_hits_survive_reload(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a", "b"], [vector(1), vector(2)])
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert reopened.get_many(["b", "a", "c"]) == [vector(2), vector(1), None]
+
+
+def test_reload_after_partial_append(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a"], [vector(1)])
+    # A crash after the vectors were appended but before their keys
+    with open(cache.vectors_path, "ab") as f:
+        f.write(np.asarray([vector(9)], dtype=np.float32).tobytes())
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert os.path.getsize(reopened.vectors_path) == 4 * 4
+    reopened.put_many(["b"], [vector(2)])
+    assert EmbeddingCache(str(tmp_path), MODEL).get_many(["a", "b"]) == [vector(1), vector(2)]
+
+
+def test_partial_append_by_another_process_keeps_rows_aligned(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a"], [vector(1)])
+    # Another worker died halfway through its append while this one kept running
+    with open(cache.vectors_path, "ab") as f:
+        f.write(np.asarray([vector(9), vector(9)], dtype=np.float32).tobytes())
+    with open(cache.keys_path, "ab") as f:
+        f.write(cache.key("x"))
+
+    cache.put_many(["b", "c"], [vector(2), vector(3)])
+    assert cache.get_many(["b", "c"]) == [vector(2), vector(3)]
+    assert EmbeddingCache(str(tmp_path), MODEL).get_many(["a", "b", "c"]) == [vector(1), vector(2), vector(3)]
+
+
+def test_reader_sees_rows_written_by_other_workers(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), MODEL)
+    writer = EmbeddingCache(str(tmp_path), MODEL)
+    assert reader.get_many(["a"]) == [None]
+
+    writer.put_many(["a", "b"], [vector(1), vector(2)])
+    assert reader.get_many(["a", "b"]) == [vector(1), vector(2)]
+
+
+def test_duplicate_rows_from_concurrent_writers(tmp_path):
+    first = EmbeddingCache(str(tmp_path), MODEL)
+    second = EmbeddingCache(str(tmp_path), MODEL)
+    first.put_many(["a"], [vector(1)])
+    second.put_many(["b"], [vector(2)])
+    # Both workers appended "c" before seeing each other's row
+    for cache in (first, second):
+        with open(cache.vectors_path, "ab") as f:
+            f.write(np.asarray([vector(3)], dtype=np.float32).tobytes())
+        with open(cache.keys_path, "ab") as f:
+            f.write(cache.key("c"))
+
+    first.put_many(["d"], [vector(4)])
+    assert second.get_many(["a", "b", "c", "d"]) == [vector(1), vector(2), vector(3), vector(4)]
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.extractors import EXTRACTORS, ExtractionError, Extractor
+from app.services.extraction_service import ExtractionService
+
+
+# Module-level so spawned workers can unpickle them
+class PagesExtractor(Extractor):
+    extensions = (".pages",)
+
+    def count_pages(self, path):
+        return 3
+
+    def extract_pages(self, path, start, end):
+        time.sleep(0.2)
+        return [f"{os.path.basename(path)} page {number}" for number in range(start, end)]
+
+
+class CrashingExtractor(Extractor):
+    extensions = (".crash",)
+
+    def extract_pages(self, path, start, end):
+        os._exit(1)
+
+
+class HangingExtractor(Extractor):
+    extensions = (".hang",)
+
+    def extract_pages(self, path, start, end):
+        time.sleep(60)
+        return []
+
+
+@pytest.fixture
+def service(monkeypatch):
+    for extractor in (PagesExtractor(), CrashingExtractor(), HangingExtractor()):
+        for extension in extractor.extensions:
+            monkeypatch.setitem(EXTRACTORS, extension, extractor)
+    service = ExtractionService(workers=2, timeout=30, pages_per_task=1)
+    yield service
+    service.shutdown()
+
+
+async def collect(service: ExtractionService, path: str, timeout: float = None):
+    try:
+        return [page async for page in service.extract(path, os.path.basename(path), timeout=timeout)]
+    except ExtractionError as e:
+        return e
+
+
+def extract_batch(service: ExtractionService, paths, timeouts=None):
+    timeouts = timeouts or {}
+
+    async def scenario():
+        return await asyncio.gather(*(collect(service, path, timeouts.get(path)) for path in paths))
+
+    return dict(zip(paths, asyncio.run(scenario())))
+
+
+def test_corrupt_pdf_fails_alone(service, tmp_path):
+    corrupt = tmp_path / "corrupt.pdf"
+    corrupt.write_bytes(b"%PDF-1.7\nthis is not a pdf")
+    paths = [str(corrupt), str(tmp_path / "a.pages"), str(tmp_path / "b.pages")]
+
+    results = extract_batch(service, paths)
+
+    assert isinstance(results[paths[0]], ExtractionError)
+    assert results[paths[1]] == [f"a.pages page {number}" for number in range(3)]
+    assert results[paths[2]] == [f"b.pages page {number}" for number in range(3)]
+
+
+def test_worker_crash_fails_only_the_crashing_file(service, tmp_path):
+    paths = [str(tmp_path / "a.pages"), str(tmp_path / "bad.crash"), str(tmp_path / "b.pages")]
+
+    results = extract_batch(service, paths)
+
+    assert isinstance(results[paths[1]], ExtractionError)
+    assert "crashed" in str(results[paths[1]])
+    assert results[paths[0]] == [f"a.pages page {number}" for number in range(3)]
+    assert results[paths[2]] == [f"b.pages page {number}" for number in range(3)]
+
+
+def test_timed_out_file_does_not_fail_the_others(service, tmp_path):
+    hanging = str(tmp_path / "slow.hang")
+    paths = [hanging, str(tmp_path / "a.pages")]
+
+    results = extract_batch(service, paths, timeouts={hanging: 1})
+
+    assert "Timed out" in str(results[hanging])
+    assert results[paths[1]] == [f"a.pages page {number}" for number in range(3)]
+    # The pool is replaced once and the next batch starts clean
+    assert extract_batch(service, [paths[1]])[paths[1]] == results[paths[1]]
@@ -0,0 +1,85 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.models import ContentGenerationRequest, ContentType
+from app.rag.config import faiss_config
+from app.rag.vectorstore import VectorStore
+from app.services.content_service import ContentService
+from app.services.llm_client import LLMResponse
+
+DIM = 8
+UID = "alice"
+
+
+class FixedQueryStore(VectorStore):
+    """Real shards and metadata; only the query embedding skips the model"""
+
+    async def embed_query(self, query):
+        return [1.0] * DIM
+
+
+class CountingLLM:
+    configured = True
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, timeout=None):
+        self.calls += 1
+        return LLMResponse(text=f"generation {self.calls}")
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_config, "persist_directory", str(tmp_path))
+    store = FixedQueryStore()
+    store.ensure_loaded()
+    return ContentService(vector_store=store, llm=CountingLLM())
+
+
+def add_document(store: VectorStore, document_id: str):
+    metadata = {"uid": UID, "document_type": "resume", "document_id": document_id}
+    texts = ["Built Python services with FastAPI", "Led a team of four engineers"]
+    vectors = np.random.default_rng(0).random((len(texts), DIM), dtype=np.float32).tolist()
+    shard = store.shards.get(UID, create=True)
+    shard.add_embeddings(texts, vectors, [dict(metadata, chunk_id=i) for i in range(len(texts))]).result(timeout=5)
+    store.metadata.add_document(document_id, UID, metadata, len(texts))
+
+
+REQUEST = ContentGenerationRequest(content_type=ContentType.COVER_LETTER, job_description="Python backend engineer")
+
+
+def test_identical_request_is_served_from_cache(service):
+    add_document(service.vector_store, "resume")
+    first = asyncio.run(service.generate_content(UID, REQUEST))
+    second = asyncio.run(service.generate_content(UID, REQUEST))
+    assert service.llm.calls == 1
+    assert second.generated_content == first.generated_content
+
+
+def test_delete_and_re_add_misses_the_cache(service):
+    store = service.vector_store
+    add_document(store, "resume")
+    asyncio.run(service.generate_content(UID, REQUEST))
+
+    asyncio.run(store.delete_document("resume"))
+    add_document(store, "resume")
+    response = asyncio.run(service.generate_content(UID, REQUEST))
+
+    assert service.llm.calls == 2
+    assert response.generated_content == "generation 2"
+
+
+def test_cleared_and_rebuilt_corpus_misses_the_cache(service):
+    store = service.vector_store
+    add_document(store, "resume")
+    asyncio.run(service.generate_content(UID, REQUEST))
+
+    # The shard is dropped and recreated, so its LSN starts over
+    store.clear_collection()
+    add_document(store, "resume")
+    asyncio.run(service.generate_content(UID, REQUEST))
+
+    assert service.llm.calls == 2
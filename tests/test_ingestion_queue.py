@@ -0,0 +1,162 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.rag.config import faiss_config
+from app.rag.executor import embedding_executor
+from app.rag.vectorstore import VectorStore
+from app.services.firestore_store import MemoryStore
+from app.services.ingestion_queue import (
+    COMPLETED, FAILED, PROCESSING, QUEUED, IngestionJob, IngestionQueue, IngestionWorker
+)
+from app.services.user_service import UserService
+
+DIM = 8
+UID = "alice"
+TEXT = "Built Python services with FastAPI and led a team of four engineers."
+
+
+async def embed_texts(texts):
+    """Deterministic embeddings, so ingestion runs without the model"""
+    return [np.full(DIM, len(text), dtype=np.float32).tolist() for text in texts]
+
+
+class FailingStore(MemoryStore):
+    """Document records cannot be written"""
+
+    def _set(self, collection, doc_id, data, merge):
+        raise RuntimeError("Firestore unavailable")
+
+
+@pytest.fixture
+def vector_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_config, "persist_directory", str(tmp_path / "vectors"))
+    monkeypatch.setattr(embedding_executor, "embed_texts", embed_texts)
+    store = VectorStore()
+    store.ensure_loaded()
+    return store
+
+
+def upload(tmp_path, queue: IngestionQueue, document_id: str = "resume") -> IngestionJob:
+    path = tmp_path / f"{document_id}.txt"
+    path.write_text(TEXT)
+    job = IngestionJob(
+        document_id=document_id,
+        uid=UID,
+        document_type="resume",
+        filename=path.name,
+        file_path=str(path),
+        file_size=len(TEXT),
+        is_text=True
+    )
+    queue.enqueue(job)
+    return job
+
+
+def run_worker(service: UserService, document_id: str) -> IngestionJob:
+    """Start the worker, wait until the job settles, then stop it"""
+    async def scenario():
+        service.ingestion_worker.start(service.ingest_documents)
+        try:
+            while True:
+                job = await asyncio.to_thread(service.ingestion_queue.get, document_id)
+                if job.status in (COMPLETED, FAILED):
+                    return job
+                await asyncio.sleep(0.05)
+        finally:
+            await service.ingestion_worker.stop()
+
+    return asyncio.run(asyncio.wait_for(scenario(), 10))
+
+
+def make_service(vector_store: VectorStore, queue: IngestionQueue, store=None) -> UserService:
+    return UserService(
+        vector_store=vector_store,
+        store=store or MemoryStore(),
+        queue=queue,
+        worker=IngestionWorker(queue, concurrency=1)
+    )
+
+
+def test_batch_is_claimed_together(tmp_path):
+    queue = IngestionQueue(str(tmp_path / "jobs.db"))
+    upload(tmp_path, queue, "single")
+    batch = [
+        IngestionJob(document_id=f"doc-{i}", uid=UID, document_type="resume", filename=f"doc-{i}.txt",
+                     file_path=str(tmp_path / f"doc-{i}.txt"), file_size=0, batch_id="batch")
+        for i in range(2)
+    ]
+    queue.enqueue_many(batch)
+
+    assert [job.document_id for job in queue.claim()] == ["single"]
+    assert sorted(job.document_id for job in queue.claim()) == ["doc-0", "doc-1"]
+    assert queue.claim() == []
+
+
+def test_leased_job_is_retried_after_a_crash_without_orphan_vectors(tmp_path, vector_store):
+    path = str(tmp_path / "jobs.db")
+    queue = IngestionQueue(path)
+    upload(tmp_path, queue)
+    [leased] = queue.claim()
+    # The process died after committing some chunks, before the job finished
+    shard = vector_store.shards.get(UID, create=True)
+    stale = [f"stale chunk {i}" for i in range(3)]
+    shard.add_embeddings(
+        stale,
+        [[float(i)] * DIM for i in range(3)],
+        [{"uid": UID, "document_id": "resume", "chunk_id": i} for i in range(3)]
+    ).result(timeout=5)
+    queue.close()
+
+    restarted = IngestionQueue(path)
+    assert restarted.get("resume").status == PROCESSING
+    service = make_service(vector_store, restarted)
+    job = run_worker(service, "resume")
+
+    assert job.status == COMPLETED
+    assert job.attempts == leased.attempts + 1
+    assert len(shard.document_ids["resume"]) == 1
+    texts = [doc.page_content for doc, _ in shard.search_by_vector([float(len(TEXT))] * DIM, 10)]
+    assert texts == [TEXT]
+    assert asyncio.run(service.store.get("user_documents", "resume"))["content"] == TEXT
+
+
+def test_failed_record_write_rolls_back_vectors(tmp_path, vector_store):
+    queue = IngestionQueue(str(tmp_path / "jobs.db"))
+    upload(tmp_path, queue)
+    service = make_service(vector_store, queue, store=FailingStore())
+
+    job = run_worker(service, "resume")
+
+    assert job.status == FAILED
+    assert "Firestore unavailable" in job.error
+    assert "resume" not in vector_store.shards.get(UID).document_ids
+
+
+def test_deleting_a_failed_upload_removes_its_vectors(tmp_path, vector_store):
+    queue = IngestionQueue(str(tmp_path / "jobs.db"))
+    job = upload(tmp_path, queue)
+    [claimed] = queue.claim()
+    # Chunks committed by an ingest that failed before writing its record
+    shard = vector_store.shards.get(UID, create=True)
+    shard.add_embeddings([TEXT], [[1.0] * DIM], [{"uid": UID, "document_id": "resume", "chunk_id": 0}]).result(
+        timeout=5)
+    queue.fail(claimed.document_id, "Firestore unavailable")
+    service = make_service(vector_store, queue)
+
+    assert asyncio.run(service.delete_document(UID, "resume"))
+    assert "resume" not in shard.document_ids
+    assert queue.get("resume") is None
+    assert not (tmp_path / job.filename).exists()
+
+
+def test_processing_job_cannot_be_removed(tmp_path):
+    queue = IngestionQueue(str(tmp_path / "jobs.db"))
+    upload(tmp_path, queue)
+    queue.claim()
+
+    assert not queue.remove("resume")
+    assert queue.requeue_interrupted() == 1
+    assert queue.get("resume").status == QUEUED
+    assert queue.remove("resume")
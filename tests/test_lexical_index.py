@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.rag.lexical_index import InvertedIndex, fuse_scores, tokenize
+from app.rag.shards import ShardManager
+
+DIM = 8
+
+
+def test_compound_terms_also_yield_their_parts():
+    assert tokenize("Node.js and C++ on CI/CD, AWS-certified") == [
+        "node.js", "node", "js", "c++", "ci/cd", "ci", "cd", "aws-certified", "aws", "certified"
+    ]
+
+
+def test_exact_term_ranks_the_chunk_that_has_it():
+    index = InvertedIndex()
+    index.add(0, "Built data pipelines in Python")
+    index.add(1, "Kubernetes operator for Kafka clusters")
+    index.add(2, "Mentored junior engineers in Python")
+
+    assert [vector_id for vector_id, _ in index.search("kafka streaming", 3)] == [1]
+    assert {vector_id for vector_id, _ in index.search("python", 3)} == {0, 2}
+
+
+def test_removed_chunk_leaves_no_postings():
+    index = InvertedIndex()
+    index.add(0, "Terraform modules for AWS")
+    index.add(1, "AWS Lambda functions")
+    index.remove(0, "Terraform modules for AWS")
+
+    assert len(index) == 1
+    assert "terraform" not in index.postings
+    assert [vector_id for vector_id, _ in index.search("terraform aws", 5)] == [1]
+    assert index.posting_count == len(tokenize("AWS Lambda functions"))
+
+
+def test_state_round_trip_searches_the_same():
+    index = InvertedIndex()
+    index.add(0, "GraphQL gateway in Go")
+    index.add(1, "REST services in Go")
+
+    restored = InvertedIndex.from_state(index.state())
+    assert restored.search("graphql go", 2) == index.search("graphql go", 2)
+    assert restored.estimate_bytes() == index.estimate_bytes()
+
+
+def test_chunk_found_by_one_retriever_gets_zero_from_the_other():
+    fused = fuse_scores(dense=[(0, 0.1), (1, 0.9)], lexical=[(2, 4.0)], alpha=0.5)
+    assert fused == {0: 0.5, 1: 0.0, 2: 0.5}
+
+
+def test_exact_keyword_chunk_outranks_dense_only_results(tmp_path):
+    shard = ShardManager(str(tmp_path), None).get("alice", create=True)
+    query = np.zeros(DIM, dtype=np.float32)
+    texts = [
+        "Designed backend services and APIs",
+        "Improved service reliability and latency",
+        "Maintained the Kafka ingestion pipeline",
+        "Organized team offsites",
+    ]
+    # Dense distance grows down the list, so the keyword chunk is only third nearest
+    vectors = [np.full(DIM, 0.1 * (i + 1), dtype=np.float32).tolist() for i in range(len(texts))]
+    shard.add_embeddings(texts, vectors, [{"document_id": "resume", "chunk_id": i} for i in range(len(texts))]).result(
+        timeout=5)
+
+    dense = shard.search_by_vector(query.tolist(), 2)
+    assert "Kafka" not in " ".join(doc.page_content for doc, _ in dense)
+
+    hybrid = shard.search_hybrid("Kafka engineer", query.tolist(), 2)
+    assert hybrid[0][0].page_content == "Maintained the Kafka ingestion pipeline"
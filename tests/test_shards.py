@@ -0,0 +1,113 @@
+import numpy as np
+
+from app.rag.shards import ShardManager, UserShard
+
+DIM = 8
+
+
+def random_vectors(count: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random((count, DIM), dtype=np.float32)
+
+
+def add_document(shard: UserShard, document_id: str, vectors: np.ndarray):
+    texts = [f"{document_id} chunk {i}" for i in range(len(vectors))]
+    metadatas = [{"document_id": document_id, "chunk_id": i} for i in range(len(vectors))]
+    shard.add_embeddings(texts, vectors.tolist(), metadatas).result(timeout=5)
+    return texts
+
+
+def nearest_text(shard: UserShard, vector: np.ndarray) -> str:
+    return shard.search_by_vector(vector.tolist(), 1)[0][0].page_content
+
+
+def test_evicted_shard_reloads_from_its_wal(tmp_path):
+    manager = ShardManager(str(tmp_path), None, memory_budget_bytes=1)
+    vectors = random_vectors(5, seed=1)
+    texts = add_document(manager.get("alice", create=True), "resume", vectors)
+
+    add_document(manager.get("bob", create=True), "notes", random_vectors(3, seed=2))
+    manager.touch("bob")
+    assert [shard.uid for shard in manager.loaded()] == ["bob"]
+
+    reloaded = manager.get("alice")
+    assert reloaded.size == 5
+    assert [nearest_text(reloaded, vector) for vector in vectors] == texts
+
+
+def test_evicted_shard_reloads_snapshot_and_later_records(tmp_path):
+    manager = ShardManager(str(tmp_path), None, memory_budget_bytes=1)
+    shard = manager.get("alice", create=True)
+    first = random_vectors(3, seed=1)
+    add_document(shard, "resume", first)
+    shard.checkpoint()
+    second = random_vectors(2, seed=2)
+    add_document(shard, "cover", second)
+
+    add_document(manager.get("bob", create=True), "notes", random_vectors(3, seed=3))
+    manager.touch("bob")
+    reloaded = manager.get("alice")
+    assert reloaded is not shard
+    assert reloaded.size == 5
+    assert nearest_text(reloaded, second[1]) == "cover chunk 1"
+    assert set(reloaded.document_ids) == {"resume", "cover"}
+
+
+def test_missing_shard_is_not_created_on_read(tmp_path):
+    manager = ShardManager(str(tmp_path), None)
+    assert manager.get("nobody") is None
+    assert list(manager.uids()) == []
+
+
+def test_deleted_document_is_hidden_from_search(tmp_path):
+    shard = ShardManager(str(tmp_path), None).get("alice", create=True)
+    kept, deleted = random_vectors(3, seed=1), random_vectors(3, seed=2)
+    add_document(shard, "kept", kept)
+    add_document(shard, "deleted", deleted)
+
+    shard.delete_document("deleted").result(timeout=5)
+
+    assert shard.size == 3
+    assert shard.tombstones == {3, 4, 5}
+    for vector in deleted:
+        assert all(doc.metadata["document_id"] == "kept" for doc, _ in shard.search_by_vector(vector.tolist(), 3))
+    assert shard.delete_document("deleted") is None
+
+
+def test_delete_survives_reload(tmp_path):
+    manager = ShardManager(str(tmp_path), None)
+    shard = manager.get("alice", create=True)
+    add_document(shard, "kept", random_vectors(2, seed=1))
+    add_document(shard, "deleted", random_vectors(2, seed=2))
+    shard.delete_document("deleted").result(timeout=5)
+
+    reloaded = ShardManager(str(tmp_path), None).get("alice")
+    assert reloaded.size == 2
+    assert set(reloaded.document_ids) == {"kept"}
+
+
+def test_compaction_keeps_surviving_ids_and_text(tmp_path):
+    manager = ShardManager(str(tmp_path), None)
+    shard = manager.get("alice", create=True)
+    kept = random_vectors(2, seed=1)
+    add_document(shard, "kept", kept)
+    surviving_ids = sorted(shard.chunks)
+    # Enough deleted text that compaction also rewrites the text file
+    add_document(shard, "deleted", random_vectors(6, seed=2))
+    old_text_file = shard.texts.name
+    shard.delete_document("deleted").result(timeout=5)
+
+    assert shard.compact() == 6
+    assert shard.index.ntotal == 2
+    assert not shard.tombstones
+    assert shard.texts.name != old_text_file
+    assert sorted(shard.chunks) == surviving_ids
+    assert [nearest_text(shard, vector) for vector in kept] == ["kept chunk 0", "kept chunk 1"]
+
+    # New chunks never reuse the IDs of compacted ones
+    add_document(shard, "later", random_vectors(1, seed=3))
+    assert shard.document_ids["later"] == [8]
+
+    shard.checkpoint(force=True)
+    reloaded = ShardManager(str(tmp_path), None).get("alice")
+    assert sorted(reloaded.chunks) == surviving_ids + [8]
+    assert [nearest_text(reloaded, vector) for vector in kept] == ["kept chunk 0", "kept chunk 1"]
@@ -0,0 +1,116 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario():
+        flight, counter = SingleFlight(), Counter()
+
+        async def compute():
+            counter.calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+        return counter.calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["result"] * 5
+
+
+def test_one_failure_is_shared_by_every_awaiter():
+    async def scenario():
+        flight, counter = SingleFlight(), Counter()
+
+        async def fail():
+            counter.calls += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("generation failed")
+
+        errors = await asyncio.gather(*(flight.do("key", fail) for _ in range(5)), return_exceptions=True)
+
+        async def succeed():
+            counter.calls += 1
+            return "retried"
+
+        # The failed call is forgotten, so a retry runs afresh
+        retried = await flight.do("key", succeed)
+        return counter.calls, errors, retried
+
+    calls, errors, retried = asyncio.run(scenario())
+    assert calls == 2
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert len({id(error) for error in errors}) == 1
+    assert retried == "retried"
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        return first, await second
+
+    first, second = asyncio.run(scenario())
+    assert first.cancelled()
+    assert second == "result"
+
+
+def test_stream_late_joiner_replays_items():
+    async def scenario():
+        flight = SingleFlight()
+        produced = asyncio.Event()
+        release = asyncio.Event()
+
+        async def tokens():
+            yield "a"
+            produced.set()
+            await release.wait()
+            yield "b"
+
+        async def collect():
+            return [item async for item in flight.stream("key", tokens)]
+
+        early = asyncio.ensure_future(collect())
+        await produced.wait()
+        late = asyncio.ensure_future(collect())
+        await asyncio.sleep(0)
+        release.set()
+        return await early, await late
+
+    early, late = asyncio.run(scenario())
+    assert early == late == ["a", "b"]
+
+
+def test_stream_failure_reaches_every_subscriber():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def tokens():
+            yield "a"
+            await asyncio.sleep(0.01)
+            raise ValueError("stream failed")
+
+        async def collect():
+            return [item async for item in flight.stream("key", tokens)]
+
+        return await asyncio.gather(collect(), collect(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
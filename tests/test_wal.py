@@ -0,0 +1,67 @@
+import os
+
+from app.rag.wal import HEADER, GroupCommitter, WriteAheadLog
+
+
+def write_records(wal: WriteAheadLog, count: int):
+    for lsn in range(1, count + 1):
+        wal.write(lsn, {"op": "add", "n": lsn})
+    wal.sync()
+
+
+def test_replay_returns_records_after_lsn(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "wal.log"))
+    write_records(wal, 3)
+    wal.close()
+
+    assert [lsn for lsn, _ in wal.replay()] == [1, 2, 3]
+    assert list(wal.replay(after_lsn=2)) == [(3, {"op": "add", "n": 3})]
+
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    path = tmp_path / "wal.log"
+    wal = WriteAheadLog(str(path))
+    write_records(wal, 3)
+    wal.close()
+    intact = os.path.getsize(path)
+    # A crash in the middle of the fourth append
+    with open(path, "ab") as f:
+        f.write(HEADER.pack(100, 0, 4) + b"partial")
+
+    assert [lsn for lsn, _ in wal.replay()] == [1, 2, 3]
+    assert os.path.getsize(path) == intact
+
+    # Appends after recovery follow the last intact record
+    wal.write(4, {"op": "delete", "document_id": "doc"})
+    wal.sync()
+    wal.close()
+    assert [lsn for lsn, _ in wal.replay()] == [1, 2, 3, 4]
+
+
+def test_corrupt_record_ends_replay(tmp_path):
+    path = tmp_path / "wal.log"
+    wal = WriteAheadLog(str(path))
+    write_records(wal, 2)
+    wal.close()
+    first = HEADER.size + HEADER.unpack(open(path, "rb").read(HEADER.size))[0]
+    with open(path, "r+b") as f:
+        # Flip a payload byte of the second record so its CRC no longer matches
+        f.seek(first + HEADER.size + 1)
+        byte = f.read(1)
+        f.seek(first + HEADER.size + 1)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    assert [lsn for lsn, _ in wal.replay()] == [1]
+    assert os.path.getsize(path) == first
+
+
+def test_group_committer_resolves_once_durable(tmp_path):
+    committer = GroupCommitter(window_seconds=0.01)
+    logs = [WriteAheadLog(str(tmp_path / f"wal-{i}.log")) for i in range(2)]
+    futures = [committer.submit(logs[lsn % 2], lsn, {"n": lsn}) for lsn in range(1, 7)]
+
+    assert [future.result(timeout=5) for future in futures] == list(range(1, 7))
+    for wal in logs:
+        wal.close()
+    assert [lsn for lsn, _ in logs[0].replay()] == [2, 4, 6]
+    assert [lsn for lsn, _ in logs[1].replay()] == [1, 3, 5]